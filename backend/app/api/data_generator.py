@@ -7,18 +7,31 @@ Usage:
     python -m app.scripts.generate_data full
     python -m app.scripts.generate_data kaggle
     python -m app.scripts.generate_data embeddings
+    python -m app.scripts.generate_data snapshot
     python -m app.scripts.generate_data stats
 """
 
 import asyncio
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import time
-from sqlalchemy import select, insert, delete, func
-from sentence_transformers import SentenceTransformer
+from sqlalchemy import select, insert, update, delete, func
 from app.core.config import config
 
 from app.database.sql_engine import get_db 
+from app.services.embedding_backfill import backfill_project_embeddings
+from app.services.embedding_snapshot import export_snapshot
+from app.services.embedding_storage import (
+    TEXT_COLUMNS,
+    embedding_values,
+    project_embedding_text,
+    stale_project_embeddings,
+    upsert_embeddings_statement
+)
+from app.services.embedding_versions import active_model, model_options
+from app.services.inference_pool import load_model
+from app.services.inference_server import InferenceClient
+from app.services.length_buckets import encode_bucketed
 from app.database.tables import (
     skills, projects, project_skills, project_embeddings,
     users, user_profiles, user_skills #noqa
@@ -34,47 +47,55 @@ KAGGLE_KEY = getattr(config, 'KAGGLE_KEY', None)
 # ============================================
 
 class EmbeddingGenerator:
-    """Service for generating embeddings"""
+    """
+    Service for generating embeddings
+    
+    The model is loaded on first use, so commands that never embed don't
+    pay for it. With EMBEDDING_INFERENCE_WORKERS > 0 batches go to the
+    shared inference server (app/scripts/inference_server.py) instead. Encodes with the model of
+    the active version (read in test_connection).
+    """
     
     def __init__(self):
-        print("🤖 Loading embedding model...")
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        print("✅ Model loaded: all-MiniLM-L6-v2 (384 dimensions)")
+        self._model = None
+        self._pool = None
+    
+    @property
+    def model(self):
+        if self._model is None:
+            print("🤖 Loading embedding model...")
+            options = model_options(active_model.model_name)
+            self._model = load_model(**options)
+            print(f"✅ Model loaded: {options['model_name']} (384 dimensions, {options['backend']})")
+        return self._model
+    
+    @property
+    def pool(self) -> Optional[InferenceClient]:
+        if self._pool is None and config.EMBEDDING_INFERENCE_WORKERS > 0:
+            self._pool = InferenceClient(
+                config.EMBEDDING_INFERENCE_SOCKET,
+                model_options(active_model.model_name),
+                n_workers=config.EMBEDDING_INFERENCE_WORKERS
+            )
+            print(f"🤖 Encoding through the shared inference server ({config.EMBEDDING_INFERENCE_SOCKET})")
+        return self._pool
     
     def encode(self, text: str) -> List[float]:
         """Generate embedding for single text"""
+        if self.pool is not None:
+            return self.pool.encode_batch([text])[0]
         embedding = self.model.encode(text, normalize_embeddings=True)
         return embedding.tolist()
     
     def encode_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        embeddings = self.model.encode(texts, normalize_embeddings=True, show_progress_bar=True)
-        return embeddings.tolist()
+        """Generate embeddings for multiple texts (length-bucketed, see app/services/length_buckets.py)"""
+        if self.pool is not None:
+            return self.pool.encode_batch(texts)
+        return encode_bucketed(self.model, texts, config.EMBEDDING_TOKEN_BUDGET).tolist()
     
     def build_project_text(self, project: Dict) -> str:
-        """Build text representation of project for embedding"""
-        parts = []
-        
-        # Title (most important)
-        parts.append(project.get('title', ''))
-        
-        # Description
-        if project.get('description'):
-            parts.append(project['description'][:300])
-        
-        # Topics
-        if project.get('topics'):
-            parts.append(f"Topics: {', '.join(project['topics'])}")
-        
-        # Language
-        if project.get('language'):
-            parts.append(f"Language: {project['language']}")
-        
-        # Difficulty
-        if project.get('difficulty'):
-            parts.append(f"Difficulty: {project['difficulty']}")
-        
-        return ". ".join(parts)
+        """Build text representation of project for embedding (shared with the API)"""
+        return project_embedding_text(project)
 
 # Initialize generator
 embedding_generator = EmbeddingGenerator()
@@ -786,20 +807,50 @@ async def get_skill_id_map() -> Dict[str, int]:
         result = await db.execute(select(skills.c.id, skills.c.name))
         return {row[1]: row[0] for row in result.fetchall()}
 
-async def project_exists(title: str, repo_url: Optional[str]) -> bool:
-    """Check if project already exists"""
+async def existing_project_id(title: str, repo_url: Optional[str]) -> Tuple[Optional[int], bool]:
+    """
+    (ID, same source) of the already imported project with this repo URL or
+    title; same source is True only for a repo URL match
+    """
     async with get_db() as db:
         if repo_url:
             result = await db.execute(
-                select(projects.c.id).where(projects.c.repo_url == repo_url)
+                select(projects.c.id).where(projects.c.repo_url == repo_url).limit(1)
             )
-            if result.first():
-                return True
+            project_id = result.scalar()
+            if project_id is not None:
+                return project_id, True
         
         result = await db.execute(
-            select(projects.c.id).where(projects.c.title == title)
+            select(projects.c.id).where(projects.c.title == title).limit(1)
         )
-        return result.first() is not None
+        return result.scalar(), False
+
+async def refresh_existing_project(project_id: int, project_data: Dict, generate_embedding: bool = True) -> bool:
+    """
+    Update an imported project's text columns from a re-fetch and re-encode
+    its embedding when the text changed (content_hash). True if re-encoded
+    """
+    async with get_db() as db:
+        await db.execute(
+            update(projects)
+            .where(projects.c.id == project_id)
+            .values(**{c.name: project_data[c.name] for c in TEXT_COLUMNS if c.name in project_data})
+        )
+        
+        if not generate_embedding:
+            return False
+        
+        stale = await stale_project_embeddings(db, [project_id])
+        for _, embedding_text in stale:
+            embedding = embedding_generator.encode(embedding_text)
+            await db.execute(
+                upsert_embeddings_statement().values(
+                    project_id=project_id,
+                    **embedding_values(embedding, text=embedding_text)
+                )
+            )
+        return bool(stale)
 
 async def insert_project_with_relations(project_data: Dict, skill_id_map: Dict[str, int], generate_embedding: bool = True) -> Optional[int]:
     """
@@ -807,8 +858,16 @@ async def insert_project_with_relations(project_data: Dict, skill_id_map: Dict[s
     """
     extracted_skills = project_data.pop('extracted_skills', [])
     
-    if await project_exists(project_data['title'], project_data.get('repo_url')):
-        print(f"⏭️  Skipping: {project_data['title']}")
+    existing_id, same_source = await existing_project_id(project_data['title'], project_data.get('repo_url'))
+    if existing_id is not None:
+        try:
+            # A title-only match may be an unrelated project: skip it, never overwrite it
+            if same_source and await refresh_existing_project(existing_id, project_data, generate_embedding):
+                print(f"🔄 Re-embedded: {project_data['title']} (text changed)")
+            else:
+                print(f"⏭️  Skipping: {project_data['title']}")
+        except Exception as e:
+            print(f"❌ Error: {project_data['title']}: {e}")
         return None
 
     async with get_db() as db:
@@ -857,7 +916,8 @@ async def insert_project_with_relations(project_data: Dict, skill_id_map: Dict[s
                     # Check if embedding already exists
                     check_result = await db.execute(
                         select(project_embeddings).where(
-                            project_embeddings.c.project_id == project_id
+                            (project_embeddings.c.project_id == project_id) &
+                            (project_embeddings.c.model_version == active_model.version)
                         )
                     )
                     
@@ -872,8 +932,7 @@ async def insert_project_with_relations(project_data: Dict, skill_id_map: Dict[s
                         await db.execute(
                             insert(project_embeddings).values(
                                 project_id=project_id,
-                                embedding=embedding,
-                                model_version="all-MiniLM-L6-v2"
+                                **embedding_values(embedding, text=embedding_text)
                             )
                         )
                         print("  🤖 Generated embedding (384-dim)")
@@ -890,73 +949,39 @@ async def insert_project_with_relations(project_data: Dict, skill_id_map: Dict[s
 # BATCH EMBEDDING GENERATION
 # ============================================
 
-async def generate_missing_embeddings():
-    """Generate embeddings for projects that don't have them"""
+async def generate_missing_embeddings(restart: bool = False):
+    """
+    Generate embeddings for projects that don't have them or whose
+    embedding is stale (project text or model_version changed, see
+    content_hash in app/services/embedding_storage.py)
+    
+    Streams the catalog in EMBEDDING_BACKFILL_CHUNK_SIZE chunks with one
+    upsert per chunk and resumes after a crash from the last committed
+    chunk (app/services/embedding_backfill.py); restart=True starts over.
+    """
     
     print("\n🤖 Generating missing embeddings...")
     print("=" * 60)
     
-    async with get_db() as db:
-        # Find projects without embeddings
-        result = await db.execute(
-            select(projects.c.id, projects.c.title, projects.c.description, 
-                   projects.c.topics, projects.c.language, projects.c.difficulty)
-            .where(
-                ~projects.c.id.in_( # ~condition   # means NOT in subquery
-                    select(project_embeddings.c.project_id)
-                )
-            )
-        )
-        
-        
-        # Converts each Row into a dictionary-like object so we can safely
-        # access column values using their names (e.g., row['id']) instead of numeric indexes.
+    stats = await backfill_project_embeddings(embedding_generator.encode_batch, restart=restart)
+    
+    if stats['written'] == 0:
+        print(f"✅ All {stats['scanned']} projects have up-to-date embeddings!")
+        return
+    
+    print(f"\n✅ Generated {stats['written']} embeddings for {stats['scanned']} projects "
+          f"in {stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} rows/s)")
 
-        # missing_projects = [dict(row._mapping) for row in result.fetchall()]
-        missing_projects = result.mappings().all()
-        
-        if not missing_projects:
-            print("✅ All projects have embeddings!")
-            return
-        
-        print(f"Found {len(missing_projects)} projects without embeddings")
-        
-        # Generate embeddings in batch
-        texts = []
-        project_ids = []
-        
-        for project in missing_projects:
-            project_data = {
-                'title': project['title'],
-                'description': project['description'],
-                'topics': project['topics'],
-                'language': project['language'],
-                'difficulty': project['difficulty']
-            }
-            texts.append(embedding_generator.build_project_text(project_data))
-            project_ids.append(project['id'])
-        
-        print("\nGenerating embeddings...")
-        embeddings = embedding_generator.encode_batch(texts)
-        
-        # Store embeddings
-        print("\nStoring embeddings...")
-        # zip() function combines two or more iterables (like lists or tuples) into pairs
-        for project_id, embedding in zip(project_ids, embeddings):
-            async with get_db() as db:
-                try:
-                    await db.execute(
-                        insert(project_embeddings).values(
-                            project_id=project_id,
-                            embedding=embedding,
-                            model_version="all-MiniLM-L6-v2"
-                        )
-                    )
-                    print(f"✅ Project {project_id}")
-                except Exception as e:
-                    print(f"❌ Project {project_id}: {e}")
-        
-        print(f"\n✅ Generated {len(embeddings)} embeddings")
+async def export_embedding_snapshot():
+    """Publish project_embeddings as a memory-mapped snapshot for the API workers"""
+    
+    if not config.EMBEDDING_SNAPSHOT_DIR:
+        print("⚠️ EMBEDDING_SNAPSHOT_DIR is not set")
+        return
+    
+    print("\n📦 Exporting embedding snapshot...")
+    header = await export_snapshot(config.EMBEDDING_SNAPSHOT_DIR)
+    print(f"✅ Published snapshot {header['version']} ({header['count']} embeddings)")
 
 # ============================================
 # GITHUB FETCHER
@@ -1248,7 +1273,10 @@ async def test_connection():
             count = result.scalar()
             print("✅ Database connection successful!")
             print(f"   Skills table has {count} records")
-            return True
+        # Embeddings are written for the version the API serves
+        await active_model.refresh()
+        print(f"   Embedding model version: {active_model.version} ({active_model.model_name})")
+        return True
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         print("\n💡 Troubleshooting:")
@@ -1291,7 +1319,10 @@ async def main():
                 await generate_kaggle_data(competitions=False, datasets=True, generate_embeddings=True)
         elif command == "embeddings":
             if await test_connection():
-                await generate_missing_embeddings()
+                await generate_missing_embeddings(restart="--restart" in sys.argv)
+        elif command == "snapshot":
+            if await test_connection():
+                await export_embedding_snapshot()
         elif command == "no-embeddings":
             if await test_connection():
                 await generate_all_data(use_github=True, use_kaggle=False, github_per_query=10, generate_embeddings=False)
@@ -1305,7 +1336,8 @@ async def main():
             print("  kaggle            - Only Kaggle projects (competitions + datasets)")
             print("  kaggle-comps      - Only Kaggle competitions")
             print("  kaggle-datasets   - Only Kaggle datasets")
-            print("  embeddings        - Generate missing embeddings")
+            print("  embeddings        - Generate missing embeddings (resumable, --restart to start over)")
+            print("  snapshot          - Publish embeddings snapshot for the API workers")
             print("  no-embeddings     - Generate data without embeddings")
     else:
         if await test_connection():
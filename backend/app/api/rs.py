@@ -7,8 +7,12 @@ Enhanced with semantic embeddings using pgvector + HuggingFace
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, update, delete, func, or_, text
-from typing import List, Optional
+from sqlalchemy import select, insert, update, delete, func, or_, text, bindparam, exists
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import threading
+import time
 
 from datetime import datetime
 from uuid import UUID
@@ -18,7 +22,8 @@ from app.models.schemas import (
     ProjectResponse, 
     RecommendationResponse, 
     InteractionCreate, 
-    UserActivitySummary
+    UserActivitySummary,
+    BatchSearchRequest
 )
 
 from sqlalchemy import cast #noqa
@@ -28,11 +33,26 @@ from app.database.sql_engine import get_db_session
 from app.database.tables import (
     users, user_profiles, skills, user_skills,
     projects, project_skills, user_project_interactions, 
-    project_plans, project_embeddings # noqa
+    project_plans, project_embeddings, user_embeddings # noqa
 )
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 # For embeddings
-from sentence_transformers import SentenceTransformer
+from app.services.inference_pool import load_model
+from app.services.inference_server import InferenceClient
+from app.services.length_buckets import encode_bucketed
+from app.services.vector_index import project_index, PROJECT_FIELDS
+from app.services.embedding_listener import embedding_listener
+from app.services.embedding_storage import (
+    embedding_column,
+    embedding_values,
+    stale_project_embeddings,
+    upsert_embeddings_statement
+)
+from app.services.embedding_cache import EmbeddingCache, normalize_text
+from app.services.encode_batcher import EncodeBatcher
+from app.services.embedding_versions import active_model, model_options
+from app.core.config import config
 
 from sqlalchemy import Table, Column, Integer, Numeric, Text
 from app.database.tables import metadata
@@ -43,18 +63,148 @@ router = APIRouter()
 # EMBEDDING MODEL (Singleton)
 # ============================================
 
+# Backoff between startup warm-up attempts (doubling up to the maximum)
+WARM_UP_RETRY_SECONDS = 5.0
+WARM_UP_MAX_RETRY_SECONDS = 300.0
+
 class EmbeddingService:
-    """Singleton service for generating embeddings"""
+    """
+    Singleton service for generating embeddings
+    
+    Request handlers use encode_async/encode_batch_async (batched, off the
+    event loop); encode/encode_batch block. Encodes use the active model
+    version unless model_version is given, through a per-model in-process
+    model or the shared inference server (app/services/inference_server.py,
+    one per host whatever the number of API workers). Nothing is loaded at
+    import: warm_up() runs from the app's lifespan, earlier encodes load on
+    first use.
+    """
     _instance = None
-    _model = None
+    _models: Dict[str, object] = {}
+    _pools: Dict[str, InferenceClient] = {}
+    _batchers: Dict[str, EncodeBatcher] = {}
+    _load_lock = threading.Lock()
+    ready = False
+    cache = EmbeddingCache(config.EMBEDDING_CACHE_SIZE, config.EMBEDDING_CACHE_TTL_SECONDS)
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-            print("✅ Loaded embedding model: all-MiniLM-L6-v2")
+            active_model.on_change(cls._instance._switch_model)
         return cls._instance
     
+    @property
+    def model(self):
+        """In-process model of the active version, loaded on first use"""
+        return self.model_for(active_model.model_name)
+    
+    def model_for(self, model_name: str):
+        """In-process SentenceTransformer (or ONNX encoder) for `model_name`"""
+        if model_name not in self._models:
+            with self._load_lock:
+                if model_name not in self._models:
+                    options = model_options(model_name)
+                    self._models[model_name] = load_model(**options)
+                    # A lazy load after a failed warm-up also makes the service ready
+                    EmbeddingService.ready = True
+                    print(f"✅ Loaded embedding model: {model_name} ({options['backend']})")
+        return self._models[model_name]
+    
+    def _pool_for(self, model_name: str) -> Optional[InferenceClient]:
+        """`model_name` on the shared inference server (None when encoding in-process)"""
+        if config.EMBEDDING_INFERENCE_WORKERS <= 0:
+            return None
+        if model_name not in self._pools:
+            self._pools[model_name] = InferenceClient(
+                config.EMBEDDING_INFERENCE_SOCKET,
+                model_options(model_name),
+                n_workers=config.EMBEDDING_INFERENCE_WORKERS
+            )
+        return self._pools[model_name]
+    
+    def _batcher_for(self, model_name: str) -> EncodeBatcher:
+        if model_name not in self._batchers:
+            pool = self._pool_for(model_name)
+            if pool is not None:
+                encode_batch = pool.encode_batch_async
+                concurrency = config.EMBEDDING_INFERENCE_WORKERS
+            else:
+                async def encode_batch(texts: List[str]) -> List[List[float]]:
+                    return await asyncio.to_thread(self._encode_batch, model_name, texts)
+                concurrency = 1
+            self._batchers[model_name] = EncodeBatcher(
+                encode_batch,
+                max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=config.EMBEDDING_BATCH_MAX_WAIT_MS,
+                concurrency=concurrency
+            )
+        return self._batchers[model_name]
+    
+    @property
+    def batchers(self) -> Dict[str, EncodeBatcher]:
+        return dict(self._batchers)
+    
+    async def warm_up(self, model_version: Optional[str] = None, retry: bool = False) -> bool:
+        """
+        Load the model (or the inference server's workers) and run a first encode
+        
+        retry=True keeps trying with exponential backoff (startup), so a
+        failed model download doesn't leave /ready at 503 for good.
+        """
+        delay = WARM_UP_RETRY_SECONDS
+        while True:
+            model_name = active_model.model_name_for(model_version)
+            started = time.perf_counter()
+            try:
+                pool = self._pool_for(model_name)
+                if pool is not None:
+                    await pool.warm_up()
+                    where = f"shared inference server, {pool.n_workers} workers"
+                else:
+                    await asyncio.to_thread(self._encode_batch, model_name, ["warm up"])
+                    where = "in-process"
+                break
+            except Exception as e:
+                if not retry:
+                    print(f"⚠️  Embedding model warm-up failed: {e}")
+                    return False
+                print(f"⚠️  Embedding model warm-up failed, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WARM_UP_MAX_RETRY_SECONDS)
+        
+        EmbeddingService.ready = True
+        print(f"✅ Embedding model warm ({where}, {time.perf_counter() - started:.1f}s): {model_name}")
+        return True
+    
+    async def _switch_model(self, old_version: str, new_version: str):
+        """active_model hook: warm the new model before queries use it"""
+        old_name = active_model.model_name_for(old_version)
+        new_name = active_model.model_name_for(new_version)
+        if new_name == old_name:
+            return
+        # Before the first warm-up the lifespan loads whichever version is active
+        if self.ready:
+            await self.warm_up(new_version)
+        asyncio.create_task(self._retire(old_name))
+    
+    async def _retire(self, model_name: str):
+        """Release a model no longer active, once in-flight requests are done"""
+        await asyncio.sleep(config.EMBEDDING_MODEL_RETIRE_SECONDS)
+        if model_name == active_model.model_name:
+            return
+        batcher = self._batchers.pop(model_name, None)
+        if batcher is not None:
+            await batcher.stop()
+        pool = self._pools.pop(model_name, None)
+        if pool is not None:
+            try:
+                await pool.release()
+            except Exception as e:
+                print(f"⚠️  Inference server did not release {model_name}: {e}")
+            pool.close()
+        self._models.pop(model_name, None)
+        print(f"🗑️  Released embedding model: {model_name}")
+    
     # Inside .encode(), SentenceTransformer does:
     # Tokenize your text
     # Run MiniLM transformer (gets token embeddings)
@@ -62,15 +212,84 @@ class EmbeddingService:
     # (Optionally) normalize
     # Return a final vector of size 384
     
-    def encode(self, text: str) -> List[float]:
+    @staticmethod
+    def cache_key(text: str, model_version: Optional[str] = None) -> str:
+        """Normalized `text`, case-folded only for uncased models"""
+        model_name = active_model.model_name_for(model_version)
+        return normalize_text(text, fold_case=model_name in config.UNCASED_MODEL_NAMES)
+    
+    def encode(self, text: str, cache: bool = True, model_version: Optional[str] = None) -> List[float]:
         """Generate embedding for text"""
-        embedding = self._model.encode(text, normalize_embeddings=True)
-        return embedding.tolist()
+        model_version = model_version or active_model.version
+        # The normalized text is only the cache key; the model gets the original
+        key = self.cache_key(text, model_version) if cache and self.cache.enabled else None
+        if key is not None:
+            cached = self.cache.get(model_version, key)
+            if cached is not None:
+                return cached
+        
+        embedding = self._encode_batch(active_model.model_name_for(model_version), [text])[0]
+        
+        if key is not None:
+            self.cache.put(model_version, key, embedding)
+        return embedding
     
-    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+    def encode_batch(self, texts: List[str], model_version: Optional[str] = None) -> List[List[float]]:
         """Generate embeddings for multiple texts"""
-        embeddings = self._model.encode(texts, normalize_embeddings=True)
-        return embeddings.tolist()
+        return self._encode_batch(active_model.model_name_for(model_version), texts)
+    
+    def _encode_batch(self, model_name: str, texts: List[str]) -> List[List[float]]:
+        pool = self._pool_for(model_name)
+        if pool is not None:
+            return pool.encode_batch(texts)
+        return encode_bucketed(self.model_for(model_name), texts, config.EMBEDDING_TOKEN_BUDGET).tolist()
+    
+    async def encode_async(
+        self,
+        text: str,
+        cache: bool = True,
+        model_version: Optional[str] = None
+    ) -> List[float]:
+        """encode() off the event loop, micro-batched with concurrent callers"""
+        if not (cache and self.cache.enabled):
+            return await self._batcher_for(active_model.model_name_for(model_version)).encode(text)
+        return (await self.encode_batch_async([text], model_version=model_version))[0]
+    
+    async def encode_batch_async(
+        self,
+        texts: List[str],
+        cache: bool = True,
+        model_version: Optional[str] = None
+    ) -> List[List[float]]:
+        """encode_batch() off the event loop; only cache misses are encoded"""
+        model_version = model_version or active_model.version
+        batcher = self._batcher_for(active_model.model_name_for(model_version))
+        if not (cache and self.cache.enabled):
+            return await batcher.encode_many(texts)
+        
+        keys = [self.cache_key(text, model_version) for text in texts]
+        found = {}
+        originals = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                found[key] = self.cache.get(model_version, key)
+                originals[key] = text
+        
+        # Duplicates within the call are encoded once, from their first original text
+        missing = [key for key, embedding in found.items() if embedding is None]
+        if missing:
+            embeddings = await batcher.encode_many([originals[key] for key in missing])
+            for key, embedding in zip(missing, embeddings):
+                found[key] = embedding
+                self.cache.put(model_version, key, embedding)
+        
+        return [found[key] for key in keys]
+    
+    async def stop(self):
+        for batcher in self._batchers.values():
+            await batcher.stop()
+        for pool in self._pools.values():
+            pool.close()
 
 # Initialize service
 embedding_service = EmbeddingService()
@@ -186,109 +405,359 @@ def build_user_query_text(user_profile: dict) -> str:
 # VECTOR SIMILARITY FUNCTIONS
 # ============================================
 
-async def find_similar_projects_vector(
-    user_query: str,
+async def apply_vector_search_settings(
+    db: AsyncSession,
+    limit: int,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None
+):
+    """
+    Set the pgvector recall/latency knob for the configured index type
+    
+    - ivfflat.probes: lists scanned (more = better recall, slower)
+    - hnsw.ef_search: candidate list size (more = better recall, slower)
+    
+    SET LOCAL only lasts for the current transaction.
+    """
+    if config.VECTOR_INDEX_TYPE == "hnsw":
+        ef_search = ef_search if ef_search is not None else config.HNSW_EF_SEARCH
+        # HNSW returns at most ef_search rows, so it must cover the limit
+        ef_search = max(int(ef_search), limit)
+        await db.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+    else:
+        probes = probes if probes is not None else config.IVFFLAT_PROBES
+        await db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+
+def topics_overlap(topics: List[str]):
+    """Any stored topic equals one of `topics`, ignoring case on both sides"""
+    topic = func.unnest(projects.c.topics).table_valued('topic').render_derived()
+    return exists(select(1).select_from(topic).where(func.lower(topic.c.topic).in_([t.lower() for t in topics])))
+
+async def find_similar_projects_pgvector(
+    query_embedding: List[float],
     db: AsyncSession,
     limit: int = 20,
     difficulty_filter: Optional[str] = None,
-    source_filter: Optional[List[str]] = None  
+    source_filter: Optional[List[str]] = None,
+    language_filter: Optional[List[str]] = None,
+    topics_filter: Optional[List[str]] = None,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    model_version: Optional[str] = None
 ) -> List[dict]:
     """
-    Find similar projects using numpy cosine similarity
+    Rank projects inside Postgres with the pgvector cosine operator
+
+    ORDER BY embedding <=> :query LIMIT :k lets the planner use the
+    idx_project_embeddings_vector index (idx_project_embeddings_half for
+    halfvec models), so only k rows cross the wire. Only rows of
+    model_version (default: the active one) are ranked.
     """
-    import numpy as np
     
-    # Generate query embedding
-    query_embedding = embedding_service.encode(user_query)
-    query_emb = np.array(query_embedding)
+    model_version = model_version or active_model.version
+    await apply_vector_search_settings(db, limit=limit, probes=probes, ef_search=ef_search)
+    
+    column = embedding_column(model_version)
+    distance = column.cosine_distance(query_embedding)
     
-    # Build query to get all projects with embeddings
     stmt = (
         select(
-            projects,
-            project_embeddings.c.embedding
+            *[projects.c[name] for name in PROJECT_FIELDS],
+            distance.label('distance')
         )
         .select_from(projects)
         .join(project_embeddings, projects.c.id == project_embeddings.c.project_id)
+        # Rendered as a literal so the planner can match the version's partial
+        # index (app/scripts/build_embedding_version.py); with a bind parameter a
+        # generic plan would use the all-versions index and filter after the scan
+        .where(project_embeddings.c.model_version == bindparam('model_version', model_version, literal_execute=True))
+        # Rows not yet moved to this version's column (mid-migration) have NULL there
+        .where(column.isnot(None))
     )
     
-    # Add filters
+    # Filters are applied to the rows the index scan returns, so a very
+    # selective filter with few probes can yield fewer than `limit` rows
     if difficulty_filter:
         stmt = stmt.where(projects.c.difficulty == difficulty_filter)
     
     if source_filter:
         stmt = stmt.where(projects.c.source.in_(source_filter))
     
+    # Case-insensitive, like the in-process bitmap filters
+    if language_filter:
+        stmt = stmt.where(func.lower(projects.c.language).in_([l.lower() for l in language_filter]))
+    
+    if topics_filter:
+        stmt = stmt.where(topics_overlap(topics_filter))
+    
+    stmt = stmt.order_by(distance).limit(limit)
+    
     result = await db.execute(stmt)
     
-    # Calculate similarities in Python
-    projects_with_similarity = []
-    for row in result:
-        project_emb = np.array(row.embedding)
-        
-        # Cosine similarity
-        similarity = np.dot(query_emb, project_emb) / (
-            np.linalg.norm(query_emb) * np.linalg.norm(project_emb)
-        )
-        
-        project_data = {
-            'id': row.id,
-            'title': row.title,
-            'description': row.description,
-            'repo_url': row.repo_url,
-            'difficulty': row.difficulty,
-            'topics': row.topics,
-            'estimated_hours': row.estimated_hours,
-            'source': row.source,
-            'stars': row.stars,
-            'language': row.language,
-            'semantic_similarity': float(similarity)
+    return [
+        {
+            **{name: getattr(row, name) for name in PROJECT_FIELDS},
+            'semantic_similarity': 1.0 - float(row.distance)  # cosine distance -> similarity
         }
-        projects_with_similarity.append(project_data)
+        for row in result
+    ]
+
+async def search_model_version(db: AsyncSession, search_mode: Optional[str] = None) -> str:
+    """
+    The model_version a query must be encoded with for `search_mode`
     
-    # Sort by similarity (highest first) and limit
-    projects_with_similarity.sort(key=lambda x: x['semantic_similarity'], reverse=True)
+    pgvector ranks the active version's rows; the in-process modes rank
+    whatever version the resident index holds (reloaded on a cutover).
+    """
+    if (search_mode or config.VECTOR_SEARCH_MODE) == "pgvector":
+        return active_model.version
+    await project_index.ensure_loaded(db)
+    return project_index.model_version
+
+async def find_similar_projects_vector(
+    user_query: str,
+    db: AsyncSession,
+    limit: int = 20,
+    difficulty_filter: Optional[str] = None,
+    source_filter: Optional[List[str]] = None,
+    language_filter: Optional[List[str]] = None,
+    topics_filter: Optional[List[str]] = None,
+    search_mode: Optional[str] = None,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_embedding: Optional[List[float]] = None,
+    model_version: Optional[str] = None
+) -> List[dict]:
+    """
+    Find similar projects by embedding similarity
+    
+    Search modes (default: config.VECTOR_SEARCH_MODE):
+    - memory: in-process vector index (app/services/vector_index.py),
+      one matrix-vector product plus a top-k selection
+    - ann: in-process IVF-PQ index (app/services/ann_index.py) scanning
+      `probes` lists, candidates re-scored exactly
+    - pgvector: ORDER BY distance LIMIT k inside Postgres, tuned with
+      probes (ivfflat) or ef_search (hnsw)
+    
+    language_filter/topics_filter match any of the given values; in the
+    in-process modes all filters are bitmap ANDs on the resident index.
+    
+    Pass query_embedding when it is already known (stored user embedding)
+    to skip encoding user_query, with the model_version it was encoded
+    with (default: the active one).
+    """
+    
+    search_mode = search_mode or config.VECTOR_SEARCH_MODE
+    search_version = await search_model_version(db, search_mode)
+    
+    # Generate query embedding (again if it is of another version, e.g. mid-cutover)
+    if query_embedding is None or (model_version or active_model.version) != search_version:
+        query_embedding = await embedding_service.encode_async(user_query, model_version=search_version)
+    
+    if search_mode == "pgvector":
+        return await find_similar_projects_pgvector(
+            query_embedding,
+            db,
+            limit=limit,
+            difficulty_filter=difficulty_filter,
+            source_filter=source_filter,
+            language_filter=language_filter,
+            topics_filter=topics_filter,
+            probes=probes,
+            ef_search=ef_search,
+            model_version=search_version
+        )
+    
+    if search_mode == "ann":
+        await project_index.ensure_ann(db)
+        return await project_index.search_ann(
+            db,
+            query_embedding,
+            limit=limit,
+            difficulty_filter=difficulty_filter,
+            source_filter=source_filter,
+            language_filter=language_filter,
+            topics_filter=topics_filter,
+            nprobe=probes or config.ANN_NPROBE,
+            candidates=config.ANN_CANDIDATES
+        )
     
-    return projects_with_similarity[:limit]
+    return await project_index.search(
+        db,
+        query_embedding,
+        limit=limit,
+        difficulty_filter=difficulty_filter,
+        source_filter=source_filter,
+        language_filter=language_filter,
+        topics_filter=topics_filter
+    )
+
 
+async def find_similar_projects_vector_batch(
+    user_queries: List[str],
+    db: AsyncSession,
+    limit: int = 20,
+    difficulty_filters: Optional[List[Optional[str]]] = None,
+    source_filters: Optional[List[Optional[List[str]]]] = None,
+    language_filters: Optional[List[Optional[List[str]]]] = None,
+    topics_filters: Optional[List[Optional[List[str]]]] = None
+) -> List[List[dict]]:
+    """
+    Batched find_similar_projects_vector (POST /projects/search/batch)
+    
+    All queries are encoded in one batch and scored against the in-memory
+    index with a single GEMM per block of queries, instead of paying the
+    per-call overhead once per query. Filters are per query (same order
+    as user_queries). Always uses the exact in-process index.
+    
+    Example (recompute recommendations for every profile):
+        texts = [build_user_query_text(p) for p in profiles]
+        results = await find_similar_projects_vector_batch(texts, db, limit=20)
+    """
+    
+    if not user_queries:
+        return []
+    
+    await project_index.ensure_loaded(db)
+    
+    query_embeddings = await embedding_service.encode_batch_async(
+        user_queries, model_version=project_index.model_version
+    )
+    
+    filters = [
+        {
+            'difficulty_filter': difficulty_filters[i] if difficulty_filters else None,
+            'source_filter': source_filters[i] if source_filters else None,
+            'language_filter': language_filters[i] if language_filters else None,
+            'topics_filter': topics_filters[i] if topics_filters else None
+        }
+        for i in range(len(user_queries))
+    ]
+    
+    return await project_index.search_batch(db, query_embeddings, limit=limit, filters=filters)
 
-async def ensure_project_embedding(project_id: int, db: AsyncSession):
-    """Generate and store embedding for a project if not exists"""
+async def get_project_similarity(
+    user_query: str,
+    project_id: int,
+    db: AsyncSession,
+    query_embedding: Optional[List[float]] = None,
+    model_version: Optional[str] = None
+) -> float:
+    """
+    Exact cosine similarity between a query and a single project
     
-    # Check if embedding exists
+    A primary-key lookup on project_embeddings with the distance computed
+    by pgvector, so only one float comes back. Returns 0.0 if the project
+    has no embedding of model_version (default: the active one) yet.
+    """
+    
+    model_version = model_version or active_model.version
+    if query_embedding is None:
+        query_embedding = await embedding_service.encode_async(user_query, model_version=model_version)
+    
+    column = embedding_column(model_version)
     result = await db.execute(
-        select(project_embeddings).where(project_embeddings.c.project_id == project_id)
+        select(column.cosine_distance(query_embedding))
+        .where(project_embeddings.c.project_id == project_id)
+        .where(project_embeddings.c.model_version == model_version)
+        .where(column.isnot(None))
     )
+    distance = result.scalar()
     
-    if result.first():
-        return  # Already exists
+    if distance is None:
+        return 0.0
     
-    # Get project data
-    result = await db.execute(
-        select(projects).where(projects.c.id == project_id)
+    return 1.0 - float(distance)  # cosine distance -> similarity
+
+async def refresh_project_embeddings(
+    db: AsyncSession,
+    project_ids: Optional[List[int]] = None,
+    model_version: Optional[str] = None
+) -> int:
+    """
+    Encode and store the embeddings that are missing or stale
+    
+    A stored embedding is current while its content_hash matches the
+    project's embedding text and its model_version (default: the active
+    one), so unchanged projects are never re-encoded. Returns the number
+    of rows written.
+    """
+    
+    model_version = model_version or active_model.version
+    stale = await stale_project_embeddings(db, project_ids, model_version)
+    if not stale:
+        return 0
+    
+    embeddings = await embedding_service.encode_batch_async(
+        [text for _, text in stale], cache=False, model_version=model_version
+    )
+    
+    await db.execute(
+        upsert_embeddings_statement(),
+        [
+            {'project_id': project_id, **embedding_values(embedding, model_version=model_version, text=text)}
+            for (project_id, text), embedding in zip(stale, embeddings)
+        ]
     )
-    project = result.first()
     
-    if not project:
-        return
+    # The NOTIFY listener patches the new vectors in after commit;
+    # without it, fall back to a full reload on the next search
+    if not embedding_listener.is_listening:
+        project_index.invalidate()
     
-    # Build embedding text
-    embedding_text = f"{project.title}. {project.description}. "
-    embedding_text += f"Topics: {', '.join(project.topics)}. "
-    embedding_text += f"Language: {project.language}. "
-    embedding_text += f"Difficulty: {project.difficulty}"
+    return len(stale)
+
+async def ensure_project_embedding(project_id: int, db: AsyncSession, model_version: Optional[str] = None) -> bool:
+    """Generate and store embedding for a project if missing or stale; True if written"""
+    return await refresh_project_embeddings(db, [project_id], model_version) > 0
+
+def profile_hash(user_query: str, model_version: Optional[str] = None) -> str:
+    """Fingerprint of a profile query text (see user_embeddings)"""
+    return hashlib.sha256(EmbeddingService.cache_key(user_query, model_version).encode("utf-8")).hexdigest()
+
+async def ensure_user_embedding(
+    user_id,
+    user_profile: dict,
+    db: AsyncSession,
+    model_version: Optional[str] = None
+) -> List[float]:
+    """
+    Profile query embedding of a user, from user_embeddings when current
+    
+    The stored row is reused while its profile_hash and model_version
+    (default: the active one) match; otherwise the profile text is encoded
+    and the row replaced. Profiles change rarely, so recommendations
+    normally skip the encode.
+    """
     
-    # Generate embedding
-    embedding = embedding_service.encode(embedding_text)
+    user_query = build_user_query_text(user_profile)
+    model_version = model_version or active_model.version
+    fingerprint = profile_hash(user_query, model_version)
     
-    # Store embedding
+    result = await db.execute(
+        select(user_embeddings.c.embedding, user_embeddings.c.profile_hash, user_embeddings.c.model_version)
+        .where(user_embeddings.c.user_id == user_id)
+    )
+    row = result.first()
+    
+    if row and row.profile_hash == fingerprint and row.model_version == model_version:
+        return row.embedding.tolist()
+    
+    embedding = await embedding_service.encode_async(user_query, model_version=model_version)
+    
+    values = {
+        'embedding': embedding,
+        'profile_hash': fingerprint,
+        'model_version': model_version,
+        'updated_at': func.now()
+    }
     await db.execute(
-        insert(project_embeddings).values(
-            project_id=project_id,
-            embedding=embedding,
-            model_version="all-MiniLM-L6-v2"
-        )
+        pg_insert(user_embeddings)
+        .values(user_id=user_id, **values)
+        .on_conflict_do_update(index_elements=[user_embeddings.c.user_id], set_=values)
     )
+    
+    return embedding
 
 # ============================================
 # HYBRID RECOMMENDATION ENGINE
@@ -394,7 +863,10 @@ async def generate_recommendations(
     db: AsyncSession,
     limit: int = 10,
     algorithm: str = "hybrid",
-    source_filter: Optional[str] = None
+    source_filter: Optional[str] = None,
+    search_mode: Optional[str] = None,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None
 ) -> dict:
     """
     Generate personalized project recommendations
@@ -419,15 +891,22 @@ async def generate_recommendations(
     recommendations = []
     
     if algorithm in ["hybrid", "semantic"]:
-        # Build semantic query from user profile
+        # Build semantic query from user profile (stored embedding when current)
         user_query = build_user_query_text(user_profile)
+        model_version = active_model.version
+        query_embedding = await ensure_user_embedding(user_profile['user_id'], user_profile, db, model_version)
         
         # Get semantically similar projects
         similar_projects = await find_similar_projects_vector(
             user_query=user_query,
             db=db,
             limit=limit * 2, # Get more for filtering
-            source_filter=sources
+            source_filter=sources,
+            search_mode=search_mode,
+            probes=probes,
+            ef_search=ef_search,
+            query_embedding=query_embedding,
+            model_version=model_version
         )
         
         # Enrich with skills
@@ -628,6 +1107,18 @@ async def create_user_profile(
         await db.commit()
         print("✅ Profile saved successfully")
         
+        # Store the profile embedding so recommendations don't re-encode it.
+        # Best effort, after the commit: on failure the first recommendation
+        # request encodes it instead
+        try:
+            saved_profile = await get_user_profile_data(user_uuid, db)
+            await ensure_user_embedding(user_uuid, saved_profile, db)
+            await db.commit()
+            print("✅ Profile embedding stored")
+        except Exception as e:
+            await db.rollback()
+            print(f"⚠️ Profile embedding not stored: {str(e)}")
+        
         return {"message": "Profile created successfully"}
     
     except Exception as e:
@@ -699,8 +1190,13 @@ async def search_projects(
     q: Optional[str] = None,
     difficulty: Optional[str] = None,
     source: Optional[str] = Query(None, regex="^(github|kaggle_competition|kaggle_dataset|curated)$"), 
+    language: Optional[str] = None,
+    topic: Optional[List[str]] = Query(None),
     use_semantic: bool = True,
     limit: int = Query(20, le=100),
+    search_mode: Optional[str] = Query(None, regex="^(memory|ann|pgvector)$"),
+    probes: Optional[int] = Query(None, ge=1, le=1000),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000),
     db: AsyncSession = Depends(get_db_session)
 ):
     """
@@ -710,11 +1206,17 @@ async def search_projects(
     - q: Search query
     - difficulty: Filter by difficulty (beginner/intermediate/advanced)
     - source: Filter by source (github/kaggle_competition/kaggle_dataset/curated)
+    - language: Filter by primary language (case-insensitive)
+    - topic: Filter by topic, repeatable (?topic=react&topic=api matches either)
     - use_semantic: Use vector similarity (True) or keyword search (False)
     - limit: Maximum results
+    - search_mode: Vector backend (memory/ann/pgvector), defaults to server config
+    - probes: Lists scanned in ann mode, ivfflat.probes in pgvector mode (recall vs latency)
+    - ef_search: hnsw.ef_search for pgvector mode (recall vs latency)
     """
     
     source_filter = [source] if source else None
+    language_filter = [language] if language else None
     
     if use_semantic and q:
         # Use vector search
@@ -723,7 +1225,12 @@ async def search_projects(
             db=db,
             limit=limit,
             difficulty_filter=difficulty,
-            source_filter=source_filter
+            source_filter=source_filter,
+            language_filter=language_filter,
+            topics_filter=topic,
+            search_mode=search_mode,
+            probes=probes,
+            ef_search=ef_search
         )
     else:
         # Traditional search
@@ -735,6 +1242,12 @@ async def search_projects(
         if source:
             query = query.where(projects.c.source == source)
         
+        if language:
+            query = query.where(func.lower(projects.c.language) == language.lower())
+        
+        if topic:
+            query = query.where(topics_overlap(topic))
+        
         if q:
             search_term = f"%{q}%"
             query = query.where(
@@ -754,10 +1267,45 @@ async def search_projects(
         "search_type": "semantic" if (use_semantic and q) else "keyword",
         "filters": {
             "difficulty": difficulty,
-            "source": source
+            "source": source,
+            "language": language,
+            "topic": topic
         }
     }
 
+@router.post("/projects/search/batch")
+async def search_projects_batch(
+    request: BatchSearchRequest,
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Semantic search for several queries in one call
+    
+    Each query has its own filters (same meaning as /projects/search).
+    The queries are encoded as one batch and scored with one GEMM per
+    block of queries (find_similar_projects_vector_batch), so bulk callers
+    pay the per-request overhead once. Always uses the exact in-process index.
+    """
+    
+    queries = request.queries
+    results = await find_similar_projects_vector_batch(
+        [query.q for query in queries],
+        db,
+        limit=request.limit,
+        difficulty_filters=[query.difficulty for query in queries],
+        source_filters=[[query.source] if query.source else None for query in queries],
+        language_filters=[[query.language] if query.language else None for query in queries],
+        topics_filters=[query.topic for query in queries]
+    )
+    
+    return {
+        "results": [
+            {"q": query.q, "projects": projects_list, "count": len(projects_list)}
+            for query, projects_list in zip(queries, results)
+        ],
+        "search_type": "semantic"
+    }
+
 @router.get("/projects/{project_id}")
 async def get_project_detail(
     project_id: int,
@@ -797,15 +1345,13 @@ async def get_project_detail(
     if user_id:
         user_profile = await get_user_profile_data(user_id, db)
         if user_profile:
-            # Get semantic similarity
+            # Get semantic similarity (point lookup, not a catalog scan)
             user_query = build_user_query_text(user_profile)
-            similar = await find_similar_projects_vector(user_query, db, limit=100)
-            
-            semantic_sim = 0.0
-            for p in similar:
-                if p['id'] == project_id:
-                    semantic_sim = p['semantic_similarity']
-                    break
+            model_version = active_model.version
+            query_embedding = await ensure_user_embedding(user_profile['user_id'], user_profile, db, model_version)
+            semantic_sim = await get_project_similarity(
+                user_query, project_id, db, query_embedding=query_embedding, model_version=model_version
+            )
             
             # Calculate hybrid score
             score, matching, missing, reason = calculate_hybrid_score(
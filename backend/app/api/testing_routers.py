@@ -1,15 +1,32 @@
-from typing import Optional
+import math
+import time
+import numpy as np
+from typing import Optional, List
 from fastapi import Depends, HTTPException, Query, APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, insert
+from sqlalchemy import select, delete, insert, func, text
 from datetime import datetime
-from app.database.sql_engine import get_db_session
+from app.core.config import config
+from app.database.sql_engine import get_db_session, autocommit_connection
+from app.services.embedding_backfill import backfill_project_embeddings
+from app.services.embedding_snapshot import export_snapshot
+from app.services.embedding_versions import active_model
+from app.services.quantization import BinaryQuantizer
+from app.services.embedding_storage import (
+    STORED_COLUMNS,
+    cosine_index,
+    embedding_column,
+    has_embedding,
+    row_vector
+)
+from app.services.vector_index import EMBEDDING_DIM, project_index, top_k_indices
 from app.database.tables import (
     projects,
     project_embeddings
 )
 from app.models.schemas import InteractionCreate
 from app.api.rs import ( 
+    embedding_service,
     ensure_project_embedding,
     user_project_interactions,
     generate_recommendations
@@ -25,6 +42,9 @@ async def get_recommendations(
     limit: int = Query(10, le=50),
     algorithm: str = Query("hybrid", regex="^(hybrid|semantic|traditional)$"),
     source_filter: Optional[str] = Query(None, regex="^(github|kaggle_competition|kaggle_dataset|curated|all)$"),
+    search_mode: Optional[str] = Query(None, regex="^(memory|ann|pgvector)$"),
+    probes: Optional[int] = Query(None, ge=1, le=1000),
+    ef_search: Optional[int] = Query(None, ge=1, le=1000),
     db: AsyncSession = Depends(get_db_session)
 ):
     """
@@ -41,6 +61,11 @@ async def get_recommendations(
     - kaggle_dataset: Kaggle datasets (analysis projects)
     - curated: Hand-picked projects
     - all (default): All sources
+    
+    Vector search tuning:
+    - search_mode: memory (exact in-process), ann (in-process IVF-PQ) or pgvector (database-side)
+    - probes: lists scanned in ann mode, ivfflat.probes in pgvector mode (ivfflat index)
+    - ef_search: hnsw.ef_search for pgvector mode (hnsw index)
     """
     
     return await generate_recommendations(
@@ -48,7 +73,10 @@ async def get_recommendations(
         db=db,
         limit=limit,
         algorithm=algorithm,
-        source_filter=source_filter
+        source_filter=source_filter,
+        search_mode=search_mode,
+        probes=probes,
+        ef_search=ef_search
     )
 
 # ------ INTERACTIONS ------
@@ -105,48 +133,294 @@ async def get_user_interactions(
 
 @router.post("/admin/embeddings/generate")
 async def generate_all_embeddings(
-    db: AsyncSession = Depends(get_db_session)
+    restart: bool = Query(False, description="Ignore the checkpoint of an interrupted run")
 ):
-    """Generate embeddings for all projects (admin endpoint)"""
-    
-    result = await db.execute(select(projects.c.id))
-    project_ids = [row[0] for row in result.fetchall()]
+    """
+    Generate embeddings for all projects whose embedding is missing or stale (admin endpoint)
     
-    generated = 0
-    skipped = 0
+    Chunked and checkpointed (app/services/embedding_backfill.py): an
+    interrupted run continues after its last committed chunk.
+    """
     
-    for project_id in project_ids:
-        result = await db.execute(
-            select(project_embeddings).where(project_embeddings.c.project_id == project_id)
-        )
-        
-        if result.first():
-            skipped += 1
-            continue
-        
-        await ensure_project_embedding(project_id, db)
-        generated += 1
+    model_version = active_model.version
+    stats = await backfill_project_embeddings(
+        lambda texts: embedding_service.encode_batch(texts, model_version=model_version),
+        model_version=model_version,
+        restart=restart
+    )
     
     return {
         "message": "Embedding generation complete",
-        "generated": generated,
-        "skipped": skipped,
-        "total": len(project_ids)
+        "generated": stats['written'],
+        "skipped": stats['scanned'] - stats['written'],
+        "total": stats['scanned'],
+        "rows_per_second": stats['rows_per_second']
     }
 
 @router.post("/admin/embeddings/regenerate/{project_id}")
 async def regenerate_project_embedding(
     project_id: int,
+    force: bool = Query(False, description="Re-encode even if the project text is unchanged"),
     db: AsyncSession = Depends(get_db_session)
 ):
-    """Regenerate embedding for a specific project"""
+    """Regenerate embedding for a specific project (only if its text or the model changed)"""
     
-    # Delete existing
-    await db.execute(
-        delete(project_embeddings).where(project_embeddings.c.project_id == project_id)
+    model_version = active_model.version
+    if force:
+        # Only the served version's row: shadow builds of other versions keep theirs
+        await db.execute(
+            delete(project_embeddings)
+            .where(project_embeddings.c.project_id == project_id)
+            .where(project_embeddings.c.model_version == model_version)
+        )
+    
+    if not await ensure_project_embedding(project_id, db, model_version):
+        return {"message": f"Embedding of project {project_id} is up to date"}
+    
+    return {"message": f"Embedding regenerated for project {project_id}"}
+
+@router.post("/admin/embeddings/snapshot")
+async def publish_embedding_snapshot():
+    """
+    Export project_embeddings to a memory-mapped snapshot and publish it
+    
+    Every API worker maps the new snapshot on its next search (shared page
+    cache, one copy per host instead of one per worker).
+    """
+    
+    if not config.EMBEDDING_SNAPSHOT_DIR:
+        raise HTTPException(status_code=400, detail="EMBEDDING_SNAPSHOT_DIR is not configured")
+    
+    try:
+        header = await export_snapshot(config.EMBEDDING_SNAPSHOT_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "message": "Snapshot published",
+        **header
+    }
+
+@router.get("/admin/embeddings/cache")
+async def query_embedding_cache_stats():
+    """Hit/miss counters of this worker's query embedding cache and micro-batchers (per model)"""
+    
+    return {
+        "cache": embedding_service.cache.stats(),
+        "active_model_version": active_model.version,
+        "batchers": {
+            model_name: {
+                "batches": batcher.batches,
+                "texts": batcher.texts,
+                "avg_batch_size": round(batcher.texts / batcher.batches, 2) if batcher.batches else None
+            }
+            for model_name, batcher in embedding_service.batchers.items()
+        }
+    }
+
+@router.delete("/admin/embeddings/cache")
+async def clear_query_embedding_cache():
+    embedding_service.cache.clear()
+    return {"message": "Query embedding cache cleared"}
+
+def choose_ivfflat_lists(row_count: int) -> int:
+    """
+    pgvector guidance for IVFFlat lists:
+    rows / 1000 up to 1M rows, sqrt(rows) above that
+    """
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+async def top_k_project_ids(
+    db: AsyncSession,
+    embedding: List[float],
+    k: int,
+    use_index: bool,
+    probes: int
+) -> List[int]:
+    """Nearest project ids, either through the vector index or by exact scan"""
+    
+    if use_index:
+        await db.execute(text("SET LOCAL enable_indexscan = on"))
+        await db.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    else:
+        # Forces a sequential scan = exact nearest neighbours
+        await db.execute(text("SET LOCAL enable_indexscan = off"))
+    
+    column = embedding_column()
+    distance = column.cosine_distance(embedding)
+    result = await db.execute(
+        select(project_embeddings.c.project_id)
+        .where(project_embeddings.c.model_version == active_model.version)
+        .where(column.isnot(None))
+        .order_by(distance)
+        .limit(k)
+    )
+    return [row[0] for row in result.fetchall()]
+
+@router.post("/admin/embeddings/rebuild-index")
+async def rebuild_vector_index(
+    probes: Optional[int] = Query(None, ge=1, le=1000),
+    sample_size: int = Query(20, ge=1, le=200),
+    k: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Rebuild the IVFFlat index with `lists` sized for the current table
+    
+    The index created by create_tables() is usually trained on an empty
+    table, so its centroids are meaningless. This endpoint:
+    1. Counts the embeddings and picks lists (rows/1000, or sqrt(rows) > 1M)
+    2. Builds a new index CONCURRENTLY and swaps it in for the old one
+    3. Estimates recall@k on `sample_size` stored vectors vs exact search
+    """
+    
+    if config.VECTOR_INDEX_TYPE != "ivfflat":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Vector index type is '{config.VECTOR_INDEX_TYPE}', not ivfflat"
+        )
+    
+    probes = probes or config.IVFFLAT_PROBES
+    
+    index_name, column_name, opclass = cosine_index()
+    
+    result = await db.execute(
+        select(func.count())
+        .select_from(project_embeddings)
+        .where(embedding_column().isnot(None))
+    )
+    row_count = result.scalar()
+    
+    if row_count == 0:
+        raise HTTPException(status_code=400, detail="No embeddings to train the index on")
+    
+    lists = choose_ivfflat_lists(row_count)
+    
+    # End the count's transaction: DROP INDEX CONCURRENTLY waits for every
+    # transaction holding a lock on project_embeddings, including this one
+    await db.commit()
+    
+    started = time.perf_counter()
+    async with autocommit_connection() as conn:
+        # Leftover from a failed run would be an INVALID index
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}_new"))
+        await conn.execute(text(f"""
+            CREATE INDEX CONCURRENTLY {index_name}_new
+            ON project_embeddings USING ivfflat ({column_name} {opclass})
+            WITH (lists = {lists})
+        """))
+        
+        # Build first, then swap, so searches are never without an index
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+        await conn.execute(text(
+            f"ALTER INDEX {index_name}_new RENAME TO {index_name}"
+        ))
+    build_seconds = time.perf_counter() - started
+    
+    # Recall estimate: stored vectors as queries, index results vs exact scan
+    result = await db.execute(
+        select(*STORED_COLUMNS)
+        .where(has_embedding())
+        .order_by(func.random())
+        .limit(sample_size)
+    )
+    samples = [row_vector(row) for row in result.fetchall()]
+    
+    recalls = []
+    for embedding in samples:
+        exact = await top_k_project_ids(db, embedding, k, use_index=False, probes=probes)
+        approx = await top_k_project_ids(db, embedding, k, use_index=True, probes=probes)
+        if exact:
+            recalls.append(len(set(exact) & set(approx)) / len(exact))
+    
+    return {
+        "message": "IVFFlat index rebuilt",
+        "index": index_name,
+        "rows": row_count,
+        "lists": lists,
+        "probes": probes,
+        "build_seconds": round(build_seconds, 2),
+        "recall_estimate": {
+            f"recall_at_{k}": round(sum(recalls) / len(recalls), 3) if recalls else None,
+            "sample_size": len(recalls)
+        }
+    }
+
+@router.get("/admin/embeddings/binary-recall")
+async def binary_quantization_recall(
+    sample_size: int = Query(20, ge=1, le=200),
+    k: int = Query(10, ge=1, le=100),
+    candidates: List[int] = Query([100, 200, 500, 1000, 2000]),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Measure recall@k of the binary (sign-bit) path against exact search
+    
+    Stored vectors are used as queries. The exact top-k comes from a
+    sequential scan in Postgres; the binary path shortlists `candidates`
+    rows by Hamming distance and reranks them with full-precision vectors.
+    Use the result to pick VECTOR_RERANK_CANDIDATES for
+    VECTOR_QUANTIZATION=binary.
+    """
+    
+    await project_index.ensure_loaded(db)
+    
+    if project_index.size == 0:
+        raise HTTPException(status_code=400, detail="Vector index is empty")
+    
+    # Reuse the resident codes when the index already runs in binary mode
+    if isinstance(project_index.quantizer, BinaryQuantizer):
+        quantizer, codes = project_index.quantizer, project_index.codes
+    else:
+        vectors = project_index.vectors()
+        quantizer = BinaryQuantizer.fit(vectors)
+        codes = quantizer.encode(vectors)
+    
+    result = await db.execute(
+        select(*STORED_COLUMNS)
+        .where(has_embedding())
+        .order_by(func.random())
+        .limit(sample_size)
     )
+    samples = [row_vector(row) for row in result.fetchall()]
+    
+    recalls = {c: [] for c in candidates}
+    hamming_only = []
+    scan_ms = []
+    
+    for embedding in samples:
+        exact = set(await top_k_project_ids(db, embedding, k, use_index=False, probes=1))
+        if not exact:
+            continue
+        
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        
+        started = time.perf_counter()
+        coarse = quantizer.scores(codes, query)
+        scan_ms.append((time.perf_counter() - started) * 1000)
+        
+        # One sorted shortlist at the largest size, prefixes give the smaller ones
+        order = top_k_indices(coarse, max(candidates))
+        full = await project_index.full_vectors(db, order)
+        scores = full @ query
+        
+        hamming_only.append(len(exact & set(project_index.ids[order[:k]].tolist())) / len(exact))
+        for c in candidates:
+            top = order[:c][top_k_indices(scores[:c], k)]
+            recalls[c].append(len(exact & set(project_index.ids[top].tolist())) / len(exact))
     
-    # Generate new
-    await ensure_project_embedding(project_id, db)
+    def mean(values):
+        return round(sum(values) / len(values), 3) if values else None
     
-    return {"message": f"Embedding regenerated for project {project_id}"}
\ No newline at end of file
+    return {
+        "rows": project_index.size,
+        "k": k,
+        "sample_size": len(hamming_only),
+        "bytes_per_vector": {"binary": int(codes.shape[1]), "float32": 4 * EMBEDDING_DIM},
+        "hamming_scan_ms": mean(scan_ms),
+        f"recall_at_{k}_hamming_only": mean(hamming_only),
+        f"recall_at_{k}_reranked": {str(c): mean(recalls[c]) for c in candidates}
+    }
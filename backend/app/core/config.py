@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import List, Optional
 
 class Config(BaseSettings):
     
@@ -22,7 +22,50 @@ class Config(BaseSettings):
     
     # Kaggle
     KAGGLE_USERNAME: Optional[str] = None
-    KAGGLE_KEY: Optional[str] = None  
+    KAGGLE_KEY: Optional[str] = None
+
+    # Vector search
+    VECTOR_SEARCH_MODE: str = "memory"  # 'memory' (exact in-process), 'ann' (in-process IVF-PQ) or 'pgvector' (ORDER BY distance in Postgres)
+    VECTOR_INDEX_TTL_SECONDS: int = 300  # Reload the in-memory index after this long
+    VECTOR_INDEX_LISTEN: bool = True  # Patch the in-memory index from project_embeddings NOTIFY events
+    VECTOR_INDEX_PATCH_DEBOUNCE_MS: int = 500  # Collect notifications this long before patching
+    VECTOR_INDEX_SHARDS: int = 0  # Worker processes splitting the float scan (0/1 = scan in-process); with EMBEDDING_SNAPSHOT_DIR all API workers share one mapped matrix
+    EMBEDDING_MODEL_VERSION: str = "all-MiniLM-L6-v2"  # model_version served until active_embedding_model points elsewhere
+    EMBEDDING_VERSION_POLL_SECONDS: int = 10  # How often workers check the active version pointer
+    EMBEDDING_MODEL_RETIRE_SECONDS: int = 60  # Grace period before a replaced model is unloaded
+    HALFVEC_STORAGE: bool = False  # Add the halfvec(384) column and index (pgvector >= 0.7); implied by HALFVEC_MODEL_VERSIONS
+    HALFVEC_MODEL_VERSIONS: List[str] = []  # model_versions stored as halfvec(384) (float16) instead of vector(384)
+    PCA_PROJECTION_DIR: Optional[str] = None  # Published PCA projections per model_version (app/scripts/fit_pca_projection.py)
+    PCA_COMPONENTS: int = 128  # Reduced dimensions when a projection has to be fitted
+    VECTOR_INDEX_TYPE: str = "ivfflat"  # pgvector index on project_embeddings: 'ivfflat' or 'hnsw'
+    EMBEDDING_SNAPSHOT_DIR: Optional[str] = None  # Serve embeddings from a shared memory-mapped snapshot
+    VECTOR_QUANTIZATION: str = "none"  # 'none' (float32 resident), 'int8' (int8 scan + float rerank), 'binary' (Hamming scan + float rerank) or 'pca' (reduced-dim scan + float rerank)
+    VECTOR_RERANK_CANDIDATES: int = 200  # Shortlist size re-scored with full-precision vectors (binary needs more, see the recall report)
+    IVFFLAT_PROBES: int = 10  # Lists scanned per pgvector query (pgvector default is 1)
+    HNSW_M: int = 16  # Max connections per HNSW graph node (build time)
+    HNSW_EF_CONSTRUCTION: int = 64  # Candidate list size while building the HNSW graph
+    HNSW_EF_SEARCH: int = 40  # Candidate list size per HNSW query (pgvector default is 40)
+    ANN_INDEX_PATH: Optional[str] = None  # Persist the in-process IVF-PQ index here (.npz, suffixed with the model_version)
+    ANN_NPROBE: int = 8  # IVF lists scanned per in-process ANN query
+    ANN_CANDIDATES: int = 200  # ANN hits re-scored with full-precision vectors
+
+    # Embedding model
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # Texts per coalesced forward pass
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0  # How long a request may wait for others to join its batch
+    EMBEDDING_INFERENCE_WORKERS: int = 0  # Processes of the shared inference server, per model (0 = load it inside each API worker)
+    EMBEDDING_INFERENCE_SOCKET: str = "/tmp/embedding-inference.sock"  # Unix socket of app/scripts/inference_server.py
+    EMBEDDING_WORKER_THREADS: int = 0  # Intra-op threads per inference worker (0 = split the cores evenly)
+    EMBEDDING_BACKEND: str = "torch"  # 'torch' (SentenceTransformer) or 'onnx' (ONNX Runtime, no torch import)
+    ONNX_MODEL_DIR: Optional[str] = None  # Exported model for the onnx backend (app/scripts/export_onnx_model.py)
+    ONNX_QUANTIZED: bool = True  # Use the dynamic int8 graph (model.int8.onnx) instead of model.onnx
+    EMBEDDING_TOKEN_BUDGET: int = 8192  # Padded tokens per forward pass when bulk-encoding length-sorted buckets
+    EMBEDDING_BACKFILL_CHUNK_SIZE: int = 500  # Projects per backfill chunk: read, encode, one upsert, checkpoint
+    EMBEDDING_CACHE_SIZE: int = 10000  # Query embeddings kept in the LRU cache per API worker (0 = no cache)
+    EMBEDDING_CACHE_TTL_SECONDS: int = 3600  # Re-encode cached query texts after this long
+    UNCASED_MODEL_NAMES: List[str] = [  # Models whose tokenizer lowercases; only their cache keys ignore case
+        "sentence-transformers/all-MiniLM-L6-v2",
+        "sentence-transformers/all-MiniLM-L12-v2"
+    ]
 
     # This is the modern syntax for Pydantic V2
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding='utf-8')
@@ -0,0 +1,26 @@
+-- ============================================
+-- PROJECT EMBEDDING COLUMNS
+-- File: app/database/embedding_columns.sql
+--
+-- Changes to project_embeddings after its first release.
+-- create_all() does not alter existing tables, so they are applied here.
+-- Rows written before content_hash existed have NULL and are re-encoded
+-- once by the next backfill.
+-- ============================================
+
+ALTER TABLE project_embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- One row per (project_id, model_version) so model versions can coexist
+UPDATE project_embeddings SET model_version = 'all-MiniLM-L6-v2' WHERE model_version IS NULL;
+
+DO $$
+BEGIN
+    IF (
+        SELECT count(*) FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = 'project_embeddings'::regclass AND i.indisprimary
+    ) = 1 THEN
+        ALTER TABLE project_embeddings DROP CONSTRAINT project_embeddings_pkey;
+        ALTER TABLE project_embeddings ADD PRIMARY KEY (project_id, model_version);
+    END IF;
+END $$;
@@ -0,0 +1,11 @@
+-- ============================================
+-- HALF PRECISION EMBEDDING COLUMN
+-- File: app/database/embedding_halfvec.sql
+--
+-- Needs pgvector >= 0.7, so it is kept apart from embedding_columns.sql
+-- and only run when HALFVEC_STORAGE or HALFVEC_MODEL_VERSIONS is set.
+-- Rows are moved into it by app/scripts/migrate_halfvec.py, which also
+-- builds its index.
+-- ============================================
+
+ALTER TABLE project_embeddings ADD COLUMN IF NOT EXISTS embedding_half halfvec(384);
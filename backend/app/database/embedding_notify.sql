@@ -0,0 +1,32 @@
+-- ============================================
+-- PROJECT EMBEDDING CHANGE NOTIFICATIONS
+-- File: app/database/embedding_notify.sql
+--
+-- Every committed write to project_embeddings sends
+--   NOTIFY project_embeddings_changed, '{"op": "INSERT", "project_id": 42, "model_version": "..."}'
+-- API workers LISTEN on the channel and patch their in-memory vector
+-- index (app/services/embedding_listener.py). Notifications are delivered
+-- on commit only, and duplicates within a transaction are folded.
+-- ============================================
+
+CREATE OR REPLACE FUNCTION notify_project_embedding_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify(
+        'project_embeddings_changed',
+        json_build_object(
+            'op', TG_OP,
+            'project_id', COALESCE(NEW.project_id, OLD.project_id),
+            'model_version', COALESCE(NEW.model_version, OLD.model_version)
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_project_embeddings_notify ON project_embeddings;
+
+CREATE TRIGGER trigger_project_embeddings_notify
+AFTER INSERT OR UPDATE OR DELETE ON project_embeddings
+FOR EACH ROW
+EXECUTE FUNCTION notify_project_embedding_change();
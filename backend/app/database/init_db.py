@@ -8,6 +8,7 @@ Loads and executes SQL procedures, triggers, and views on startup.
 from sqlalchemy import text
 from pathlib import Path
 from app.database.sql_engine import engine
+from app.database.tables import HALFVEC_ENABLED
 import asyncpg
 
 async def initialize_database_objects():
@@ -23,9 +24,15 @@ async def initialize_database_objects():
     sql_files = [
         ('functions.sql', 'Functions'),
         ('triggers.sql', 'Database Triggers'),
-        ('views.sql', 'Database Views')
+        ('views.sql', 'Database Views'),
+        ('embedding_columns.sql', 'Embedding Columns'),
+        ('embedding_notify.sql', 'Embedding Change Notifications')
     ]
     
+    # Separate file: fails without pgvector >= 0.7
+    if HALFVEC_ENABLED:
+        sql_files.append(('embedding_halfvec.sql', 'Half Precision Embedding Column'))
+    
     try:
         # Build asyncpg connection from SQLAlchemy URL components
         url = engine.url
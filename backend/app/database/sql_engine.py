@@ -1,6 +1,8 @@
+from typing import Optional
 from app.core.config import config
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from app.database.tables import metadata #noqa
+from app.database.tables import metadata, vector_index_method #noqa
 from contextlib import asynccontextmanager
 
 engine = create_async_engine(
@@ -25,6 +27,27 @@ async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(metadata.create_all)
 
+# Connection for CREATE/DROP INDEX CONCURRENTLY, which cannot run inside a transaction block
+@asynccontextmanager
+async def autocommit_connection():
+    async with engine.connect() as conn:
+        yield await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+async def create_vector_index_concurrently(name: str, column_name: str, opclass: str, where: Optional[str] = None):
+    """
+    Build a pgvector index on project_embeddings without blocking writes,
+    with the same type and parameters as the create_all() ones
+    """
+    method, params = vector_index_method()
+    ddl = f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON project_embeddings USING {method} ({column_name} {opclass})"
+    if params:
+        ddl += " WITH (" + ", ".join(f"{key} = {value}" for key, value in params.items()) + ")"
+    if where:
+        ddl += f" WHERE {where}"
+
+    async with autocommit_connection() as conn:
+        await conn.execute(text(ddl))
+
 # Context manager for service functions
 @asynccontextmanager
 async def get_db():
@@ -1,7 +1,8 @@
 import sqlalchemy
 from sqlalchemy.dialects.postgresql import UUID, JSONB, TIMESTAMP, TEXT, ARRAY
 from sqlalchemy import func, Column, CheckConstraint, UniqueConstraint, Index, ForeignKey
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import Vector, HALFVEC
+from app.core.config import config
 
 metadata = sqlalchemy.MetaData()
 
@@ -139,22 +140,110 @@ Index("idx_project_skills_skill", project_skills.c.skill_id)
 # EMBEDDINGS CACHE 
 # ============================================
 
+# Half precision storage needs pgvector >= 0.7, so its column and index only
+# exist when enabled. Added to existing databases by embedding_halfvec.sql
+HALFVEC_ENABLED = config.HALFVEC_STORAGE or bool(config.HALFVEC_MODEL_VERSIONS)
+
+# One row per (project, model_version): versions coexist during a shadow
+# build (app/services/embedding_versions.py). Existing databases are moved
+# to the composite key by embedding_columns.sql
 project_embeddings = sqlalchemy.Table(
     "project_embeddings",
     metadata,
     Column("project_id", sqlalchemy.Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
     Column("embedding", Vector(384)),  # 384-dim for all-MiniLM-L6-v2
-    Column("model_version", TEXT, default="all-MiniLM-L6-v2"),
+    # Half precision copy for model_versions in HALFVEC_MODEL_VERSIONS (embedding is NULL then)
+    *([Column("embedding_half", HALFVEC(384))] if HALFVEC_ENABLED else []),
+    Column("model_version", TEXT, primary_key=True, default="all-MiniLM-L6-v2"),
+    # sha256 of model_version + the embedded text (app/services/embedding_storage.py).
+    # Added to existing databases by embedding_columns.sql
+    Column("content_hash", TEXT),
     Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
     Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
 )
 
-# Add index for faster similarity search (IVFFlat or HNSW)
-# IVFFlat is good for < 1M vectors
-Index('idx_project_embeddings_vector', 
-      project_embeddings.c.embedding, 
-      postgresql_using='ivfflat',
-      postgresql_ops={'embedding': 'vector_cosine_ops'})
+# Add index for faster similarity search (IVFFlat or HNSW, see VECTOR_INDEX_TYPE)
+# IVFFlat is good for < 1M vectors but needs data to train its lists, so it
+# has poor recall when built on a small/empty table and must be rebuilt as
+# the catalog grows. HNSW builds incrementally and keeps recall on inserts.
+# create_all() skips an existing index: drop it to switch types.
+def vector_index_method():
+    """(access method, WITH parameters) of VECTOR_INDEX_TYPE, for every pgvector index"""
+    if config.VECTOR_INDEX_TYPE == 'hnsw':
+        return 'hnsw', {'m': config.HNSW_M, 'ef_construction': config.HNSW_EF_CONSTRUCTION}
+    return 'ivfflat', {}
+
+def vector_cosine_index(name, column, opclass):
+    method, params = vector_index_method()
+    return Index(name,
+                 column,
+                 postgresql_using=method,
+                 postgresql_with=params,
+                 postgresql_ops={column.name: opclass})
+
+vector_cosine_index('idx_project_embeddings_vector', project_embeddings.c.embedding, 'vector_cosine_ops')
+if HALFVEC_ENABLED:
+    vector_cosine_index('idx_project_embeddings_half', project_embeddings.c.embedding_half, 'halfvec_cosine_ops')
+
+# ============================================
+# EMBEDDING MODEL VERSIONS
+# ============================================
+
+embedding_models = sqlalchemy.Table(
+    "embedding_models",
+    metadata,
+    Column("model_version", TEXT, primary_key=True),
+    Column("model_name", TEXT, nullable=False),  # sentence-transformers model id, must produce 384 dims
+    Column("status", TEXT, nullable=False, server_default="building"),
+    Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now()),
+
+    CheckConstraint("status IN ('building', 'ready', 'retired')", name="check_embedding_models_status")
+)
+
+# Single row: the model_version being served. Cutover is one UPDATE
+active_embedding_model = sqlalchemy.Table(
+    "active_embedding_model",
+    metadata,
+    Column("id", sqlalchemy.Boolean, primary_key=True, server_default=sqlalchemy.true()),
+    Column("model_version", TEXT, ForeignKey("embedding_models.model_version"), nullable=False),
+    Column("activated_at", TIMESTAMP(timezone=True), server_default=func.now()),
+
+    CheckConstraint("id", name="check_active_embedding_model_single_row")
+)
+
+# Resume point of the embedding backfill (app/services/embedding_backfill.py)
+# per model_version: every project up to last_project_id has been checked.
+# Written in the same transaction as the chunk it covers; deleted when a
+# pass completes.
+embedding_backfill_checkpoints = sqlalchemy.Table(
+    "embedding_backfill_checkpoints",
+    metadata,
+    Column("model_version", TEXT, primary_key=True),
+    Column("last_project_id", sqlalchemy.Integer, nullable=False),
+    Column("rows_scanned", sqlalchemy.Integer, nullable=False, server_default="0"),
+    Column("rows_written", sqlalchemy.Integer, nullable=False, server_default="0"),
+    Column("started_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+)
+
+# ============================================
+# USER EMBEDDINGS
+# ============================================
+
+# Profile query embedding per user, written when the profile is saved.
+# profile_hash is the sha256 of the normalized build_user_query_text();
+# a row whose hash or model_version no longer matches is stale.
+user_embeddings = sqlalchemy.Table(
+    "user_embeddings",
+    metadata,
+    Column("user_id", UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True),
+    Column("embedding", Vector(384), nullable=False),
+    Column("profile_hash", TEXT, nullable=False),
+    Column("model_version", TEXT, nullable=False),
+    Column("created_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    Column("updated_at", TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+)
 
 # ============================================
 # USER ACTIVITY LOG
@@ -1,9 +1,16 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router as api_router
 from contextlib import asynccontextmanager
 from app.database.sql_engine import engine
 from app.database.init_db import initialize_database_objects, verify_database_objects
+from app.core.config import config
+from app.services.embedding_listener import embedding_listener
+from app.services.embedding_versions import active_model
+from app.services.vector_index import project_index
+from app.api.rs import embedding_service
 
 #context manager is basically a function that sets up a context for some code to run in, and then cleans up after that code has run: setup and teardown logic
 #lifespan event to connect and disconnect the database when the app starts and stops: it's done before any request is handled
@@ -30,9 +37,28 @@ async def lifespan(app: FastAPI):
         # Don't crash the app - it might be a permissions issue
         # The app can still run with Python-only logic
     
+    # Active embedding model version (active_embedding_model pointer), then poll for cutovers
+    try:
+        await active_model.refresh()
+    except Exception as e:
+        print(f"⚠️  Could not read the active embedding version, serving '{active_model.version}': {e}")
+    active_model.start()
+    
+    # Live vector index updates (project_embeddings trigger -> NOTIFY)
+    if config.VECTOR_INDEX_LISTEN:
+        embedding_listener.start()
+    
+    # Load and warm the embedding model without delaying startup (see /ready)
+    warm_up = asyncio.create_task(embedding_service.warm_up(retry=True))
+    
     print("✅ Server ready to accept requests\n")
     
     yield #lifespan function will pause here and let the app run to handle requests and when the app is shutting down, it will resume here
+    warm_up.cancel()
+    await active_model.stop()
+    await embedding_listener.stop()
+    await embedding_service.stop()
+    project_index.close()
     await engine.dispose() #dispose of the engine, closing all connections in the pool
     print("✅ Database connections closed")
 
@@ -61,4 +87,11 @@ async def health_check():
         "status": "healthy",
         "database": "connected",
         "api_version": "v1"
-    }
\ No newline at end of file
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the embedding model is loaded and warmed"""
+    if not embedding_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 # ============================================
@@ -41,6 +41,17 @@ class ProjectResponse(BaseModel):
     stars: int
     language: str
 
+class BatchSearchQuery(BaseModel):
+    q: str
+    difficulty: Optional[str] = None
+    source: Optional[str] = None
+    language: Optional[str] = None
+    topic: Optional[List[str]] = None  # matches any of the topics
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery] = Field(..., min_length=1, max_length=256)
+    limit: int = Field(20, ge=1, le=100)
+
 class RecommendationResponse(BaseModel):
     project_id: int
     title: str
@@ -0,0 +1,144 @@
+"""
+Shadow Build of an Embedding Model Version
+File: app/scripts/build_embedding_version.py
+
+Embeds the catalog with another sentence-transformers model next to the
+version being served (see app/services/embedding_versions.py), then
+optionally switches serving to it in one step.
+
+Usage:
+    python -m app.scripts.build_embedding_version --list
+    python -m app.scripts.build_embedding_version minilm-l12 sentence-transformers/all-MiniLM-L12-v2
+    python -m app.scripts.build_embedding_version minilm-l12 --activate    # catch up, then cut over
+
+Steps:
+1. Registers the version as 'building'; serving is unaffected
+2. Back-fills its rows in chunks, one short transaction each
+   (app/services/embedding_backfill.py). Interrupted runs resume from the
+   last committed chunk
+3. Marks it 'ready' once every project has a row
+4. Builds a partial pgvector index (WHERE model_version = ...) CONCURRENTLY.
+   The served version gets one before the back-fill starts: once two
+   versions share the table, the all-versions index returns rows of both
+   and searches filtering one version would come up short
+5. --activate: points active_embedding_model at it. API workers pick the
+   change up within EMBEDDING_VERSION_POLL_SECONDS, warm the new model
+   first and reload their vector index
+
+The model must produce 384-dim vectors (the column type). Roll back by
+activating the previous version, whose rows are left in place.
+"""
+
+import argparse
+import asyncio
+import re
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import config
+from app.database.sql_engine import create_vector_index_concurrently, engine, get_db
+from app.database.tables import embedding_models
+from app.services.embedding_backfill import backfill_project_embeddings
+from app.services.embedding_storage import cosine_index
+from app.services.embedding_versions import (
+    activate_version,
+    active_model,
+    missing_rows,
+    model_options,
+    register_version,
+    set_status
+)
+from app.services.inference_pool import MODEL_NAME, load_model
+from app.services.length_buckets import encode_bucketed
+
+EMBEDDING_DIM = 384
+
+async def register_default_version(db):
+    """Registry row for the default version, so it can be activated again later"""
+    await db.execute(
+        pg_insert(embedding_models)
+        .values(model_version=config.EMBEDDING_MODEL_VERSION, model_name=MODEL_NAME, status='ready')
+        .on_conflict_do_nothing(index_elements=[embedding_models.c.model_version])
+    )
+
+async def list_versions():
+    async with get_db() as db:
+        result = await db.execute(select(embedding_models).order_by(embedding_models.c.created_at))
+        rows = result.fetchall()
+
+    if not rows:
+        print(f"ℹ️  No registered versions; serving the default '{config.EMBEDDING_MODEL_VERSION}' ({MODEL_NAME})")
+    for row in rows:
+        marker = "→" if row.model_version == active_model.version else " "
+        print(f"{marker} {row.model_version:<24} {row.status:<9} {row.model_name}")
+
+async def create_version_index(model_version: str):
+    """Partial index over the version's rows, same type and parameters as the main index"""
+    _, column_name, opclass = cosine_index(model_version)
+    index_name = "idx_project_embeddings_" + re.sub(r'[^a-z0-9]+', '_', model_version.lower()).strip('_')
+    literal = model_version.replace("'", "''")
+    await create_vector_index_concurrently(index_name, column_name, opclass, where=f"model_version = '{literal}'")
+    print(f"✅ Index {index_name} ready")
+
+async def build(model_version: str, model_name: str, chunk_size: int) -> bool:
+    """Shadow-build `model_version`; True once it is ready"""
+    async with get_db() as db:
+        await register_default_version(db)
+        await register_version(db, model_version, model_name)
+
+    print(f"🔨 Building '{model_version}' with {model_name}...")
+    model = load_model(**model_options(model_name))
+    dim = len(encode_bucketed(model, ["dimension check"], config.EMBEDDING_TOKEN_BUDGET)[0])
+    if dim != EMBEDDING_DIM:
+        print(f"❌ {model_name} produces {dim}-dim vectors, project_embeddings stores {EMBEDDING_DIM}")
+        return False
+
+    if model_version != active_model.version:
+        await create_version_index(active_model.version)
+
+    stats = await backfill_project_embeddings(
+        lambda texts: encode_bucketed(model, texts, config.EMBEDDING_TOKEN_BUDGET).tolist(),
+        model_version=model_version,
+        chunk_size=chunk_size
+    )
+    print(f"✅ Back-fill complete: {stats['written']} rows written ({stats['rows_per_second']} rows/s)")
+
+    async with get_db() as db:
+        remaining = await missing_rows(db, model_version)
+        if remaining:
+            print(f"⚠️  {remaining} projects still have no '{model_version}' row; re-run to continue")
+            return False
+        await set_status(db, model_version, 'ready')
+
+    await create_version_index(model_version)
+    print(f"✅ '{model_version}' is ready")
+    return True
+
+async def main():
+    parser = argparse.ArgumentParser(description="Shadow-build an embedding model version and cut over to it")
+    parser.add_argument("model_version", nargs="?")
+    parser.add_argument("model_name", nargs="?", help="sentence-transformers model (default: the registered one)")
+    parser.add_argument("--activate", action="store_true", help="Serve the version once it is ready")
+    parser.add_argument("--list", action="store_true", help="Show registered versions")
+    parser.add_argument("--chunk-size", type=int, default=config.EMBEDDING_BACKFILL_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    await active_model.refresh()
+
+    if args.list or not args.model_version:
+        await list_versions()
+        await engine.dispose()
+        return
+
+    model_name = args.model_name or active_model.model_name_for(args.model_version)
+    # Catch up on projects added since an earlier build before cutting over
+    if await build(args.model_version, model_name, args.chunk_size) and args.activate:
+        async with get_db() as db:
+            await activate_version(db, args.model_version)
+        print(f"🔀 Activated '{args.model_version}'; API workers switch within {config.EMBEDDING_VERSION_POLL_SECONDS}s")
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
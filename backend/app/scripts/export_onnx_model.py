@@ -0,0 +1,129 @@
+"""
+Export MiniLM to ONNX and Check Parity
+File: app/scripts/export_onnx_model.py
+
+Build step for EMBEDDING_BACKEND=onnx. Exports the transformer of
+all-MiniLM-L6-v2 to ONNX, writes a dynamic int8 quantized copy, and checks
+both against the PyTorch vectors on the curated catalog
+(data_generator.CURATED_PROJECTS). Exits non-zero when any cosine is below
+the threshold, so it can gate a deploy.
+
+Needs torch, sentence-transformers, onnx and onnxruntime; only the API hosts
+running the onnx backend can skip torch.
+
+Usage:
+    python -m app.scripts.export_onnx_model                    # export to ONNX_MODEL_DIR + parity check
+    python -m app.scripts.export_onnx_model --out ./onnx-minilm
+    python -m app.scripts.export_onnx_model --check            # parity check of an existing export
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from app.api.data_generator import CURATED_PROJECTS, embedding_generator
+from app.core.config import config
+from app.services.inference_pool import load_model
+from app.services.onnx_encoder import OnnxEncoder, onnx_model_path
+
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+def export(out_dir: str):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = load_model()
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, "tokenizer.json"))
+
+    sample = tokenizer(["warm up"], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in INPUT_NAMES),
+            onnx_model_path(out_dir, quantized=False),
+            input_names=INPUT_NAMES,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES + ["last_hidden_state"]},
+            opset_version=14
+        )
+    print(f"✅ Exported {onnx_model_path(out_dir, quantized=False)}")
+
+    quantize_dynamic(
+        onnx_model_path(out_dir, quantized=False),
+        onnx_model_path(out_dir, quantized=True),
+        weight_type=QuantType.QInt8
+    )
+    print(f"✅ Quantized {onnx_model_path(out_dir, quantized=True)}")
+
+def curated_texts() -> List[str]:
+    """Embedding texts of the curated catalog, as generate_all_data builds them"""
+    return [
+        embedding_generator.build_project_text({**project, 'source': 'curated', 'language': 'Multiple'})
+        for project in CURATED_PROJECTS
+    ]
+
+def query_latency_ms(encoder, texts: List[str]) -> float:
+    """Median single-text encode latency (the per-query path)"""
+    encoder.encode(texts[0], normalize_embeddings=True)
+    timings = []
+    for text in texts:
+        started = time.perf_counter()
+        encoder.encode(text, normalize_embeddings=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings))
+
+def check_parity(model_dir: str, threshold: float) -> bool:
+    texts = curated_texts()
+    reference_model = load_model()
+    reference = np.asarray(reference_model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    print(f"🔍 Parity on {len(texts)} curated projects (torch: {query_latency_ms(reference_model, texts):.1f} ms/query)")
+
+    passed, checked = True, 0
+    for quantized in (False, True):
+        if not os.path.exists(onnx_model_path(model_dir, quantized)):
+            continue
+        checked += 1
+
+        encoder = OnnxEncoder(model_dir, quantized=quantized)
+        cosines = (reference * encoder.encode(texts, normalize_embeddings=True)).sum(axis=1)
+        ok = bool(cosines.min() >= threshold)
+        passed = passed and ok
+
+        label = "onnx int8" if quantized else "onnx fp32"
+        print(f"  {'✅' if ok else '❌'} {label}: min cosine {cosines.min():.4f}, mean {cosines.mean():.4f}, "
+              f"{query_latency_ms(encoder, texts):.1f} ms/query")
+
+    if not checked:
+        print(f"❌ No ONNX model in {model_dir}")
+        return False
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Export MiniLM to ONNX (+ int8) and check parity with torch")
+    parser.add_argument("--out", default=config.ONNX_MODEL_DIR)
+    parser.add_argument("--check", action="store_true", help="Only run the parity check")
+    parser.add_argument("--threshold", type=float, default=0.99)
+    args = parser.parse_args()
+
+    if not args.out:
+        print("⚠️ Set ONNX_MODEL_DIR or pass --out")
+        sys.exit(2)
+
+    if not args.check:
+        export(args.out)
+
+    if not check_parity(args.out, args.threshold):
+        print(f"❌ ONNX parity check failed (threshold: cosine {args.threshold})")
+        sys.exit(1)
+    print("✅ ONNX backend matches torch")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Fit and Publish a PCA Projection
+File: app/scripts/fit_pca_projection.py
+
+Batch job for VECTOR_QUANTIZATION=pca. Fits the projection on a random
+sample of one model_version's embeddings and publishes it under
+PCA_PROJECTION_DIR/<model_version>/. API workers switch to it on their next
+search (no restart). Re-run after re-embedding the catalog with a new model.
+
+Usage:
+    python -m app.scripts.fit_pca_projection                      # active model, 128 dims
+    python -m app.scripts.fit_pca_projection all-MiniLM-L6-v2 --components 64
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.config import config
+from app.database.sql_engine import engine, get_db
+from app.services.embedding_storage import STORED_COLUMNS, has_embedding, row_vector
+from app.services.embedding_versions import active_model
+from app.services.quantization import PCAProjection
+from app.services.vector_index import normalize_rows, top_k_indices
+
+async def load_sample(model_version: str, sample_size: int) -> np.ndarray:
+    async with get_db() as db:
+        result = await db.execute(
+            select(*STORED_COLUMNS)
+            .where(has_embedding(model_version))
+            .order_by(func.random())
+            .limit(sample_size)
+        )
+        rows = result.fetchall()
+
+    return normalize_rows(np.array([row_vector(row) for row in rows], dtype=np.float32))
+
+def estimate_recall(
+    projection: PCAProjection,
+    vectors: np.ndarray,
+    k: int = 10,
+    candidates: int = 200,
+    n_queries: int = 100
+) -> float:
+    """recall@k of reduced-dim shortlist + full rerank vs exact, on the sample itself"""
+    codes = projection.encode(vectors)
+    rng = np.random.default_rng(1)
+    recalls = []
+
+    for i in rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False):
+        exact = vectors @ vectors[i]
+        shortlist = top_k_indices(projection.scores(codes, vectors[i]), candidates, sort=False)
+        reranked = shortlist[top_k_indices(exact[shortlist], k)]
+        recalls.append(len(set(top_k_indices(exact, k).tolist()) & set(reranked.tolist())) / k)
+
+    return float(np.mean(recalls))
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fit a PCA projection for the two-stage vector search")
+    parser.add_argument("model_version", nargs="?", help="Defaults to the active version")
+    parser.add_argument("--components", type=int, default=config.PCA_COMPONENTS)
+    parser.add_argument("--sample", type=int, default=50000)
+    args = parser.parse_args()
+
+    if not config.PCA_PROJECTION_DIR:
+        print("⚠️ PCA_PROJECTION_DIR is not set")
+        return
+
+    if not args.model_version:
+        await active_model.refresh()
+        args.model_version = active_model.version
+
+    print(f"📐 Fitting {args.components}-dim PCA for '{args.model_version}'...")
+    vectors = await load_sample(args.model_version, args.sample)
+    await engine.dispose()
+
+    if len(vectors) <= args.components:
+        print(f"⚠️ Only {len(vectors)} embeddings, need more than {args.components}")
+        return
+
+    projection = PCAProjection.fit(
+        vectors,
+        n_components=args.components,
+        model_version=args.model_version,
+        version=datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    )
+    recall = estimate_recall(projection, vectors, candidates=config.VECTOR_RERANK_CANDIDATES)
+
+    projection.save(config.PCA_PROJECTION_DIR)
+
+    print(f"✅ Published projection {projection.version} ({len(vectors)} sample vectors)")
+    print(f"   Explained variance: {projection.explained_variance:.1%}")
+    print(f"   recall@10 with {config.VECTOR_RERANK_CANDIDATES} reranked candidates: {recall:.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Shared Embedding Inference Server
+File: app/scripts/inference_server.py
+
+Runs the inference pool once per host (app/services/inference_server.py).
+Start it next to the API; with EMBEDDING_INFERENCE_WORKERS > 0 every
+uvicorn worker encodes through its socket instead of loading the model.
+
+Usage:
+    python -m app.scripts.inference_server                  # EMBEDDING_INFERENCE_WORKERS workers per model
+    python -m app.scripts.inference_server --workers 4 --socket /run/embedding.sock
+
+The active model version is warmed at startup; other versions (shadow
+builds, cutovers) get a pool on their first request and lose it when the
+API retires them.
+"""
+
+import argparse
+import asyncio
+
+from app.core.config import config
+from app.database.sql_engine import engine
+from app.services.embedding_versions import active_model, model_options
+from app.services.inference_server import InferenceServer
+
+async def main():
+    parser = argparse.ArgumentParser(description="Serve embedding inference to every API worker on a Unix socket")
+    parser.add_argument("--socket", default=config.EMBEDDING_INFERENCE_SOCKET)
+    parser.add_argument("--workers", type=int, default=max(1, config.EMBEDDING_INFERENCE_WORKERS))
+    args = parser.parse_args()
+
+    try:
+        await active_model.refresh()
+    except Exception as e:
+        print(f"⚠️  Could not read the active embedding version, warming '{active_model.version}': {e}")
+    await engine.dispose()
+
+    server = InferenceServer(
+        args.socket,
+        args.workers,
+        threads=config.EMBEDDING_WORKER_THREADS,
+        token_budget=config.EMBEDDING_TOKEN_BUDGET
+    )
+    await server.serve(warm_models=[model_options(active_model.model_name)])
+
+if __name__ == "__main__":
+    asyncio.run(main())
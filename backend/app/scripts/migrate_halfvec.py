@@ -0,0 +1,112 @@
+"""
+Half-Precision Embedding Migration
+File: app/scripts/migrate_halfvec.py
+
+Moves the embeddings of one model_version between vector(384) and
+halfvec(384) storage (see app/services/embedding_storage.py).
+
+Usage:
+    python -m app.scripts.migrate_halfvec                              # active version, vector -> halfvec
+    python -m app.scripts.migrate_halfvec all-MiniLM-L6-v2             # vector -> halfvec
+    python -m app.scripts.migrate_halfvec all-MiniLM-L6-v2 --to-vector # halfvec -> vector
+
+Set HALFVEC_STORAGE=true and restart first: the embedding_half column is
+added at startup (app/database/embedding_halfvec.sql), and only then.
+
+Steps:
+1. Back-fills in batches, one short transaction each, so the table is
+   never locked for long; readers accept either column meanwhile
+2. Builds the halfvec cosine index CONCURRENTLY
+
+Then add the model_version to HALFVEC_MODEL_VERSIONS (or remove it) and
+restart, and run the script once more to move rows written in between.
+Keep HALFVEC_STORAGE on until a move back to vector has finished.
+VACUUM project_embeddings afterwards to reclaim the old column's space.
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.core.config import config
+from app.database.sql_engine import create_vector_index_concurrently, engine
+from app.database.tables import HALFVEC_ENABLED
+from app.services.embedding_versions import active_model
+
+async def backfill(model_version: str, to_halfvec: bool, batch_size: int) -> int:
+    """Convert one batch per transaction until no row is left"""
+    source, target, target_type = (
+        ('embedding', 'embedding_half', 'halfvec(384)') if to_halfvec
+        else ('embedding_half', 'embedding', 'vector(384)')
+    )
+
+    moved = 0
+    started = time.perf_counter()
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(text(f"""
+                UPDATE project_embeddings
+                SET {target} = {source}::{target_type}, {source} = NULL, updated_at = NOW()
+                WHERE model_version = :model_version AND project_id IN (
+                    SELECT project_id FROM project_embeddings
+                    WHERE model_version = :model_version AND {source} IS NOT NULL
+                    ORDER BY project_id
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+            """), {'model_version': model_version, 'batch_size': batch_size})
+
+        if result.rowcount == 0:
+            break
+
+        moved += result.rowcount
+        rate = moved / max(time.perf_counter() - started, 1e-9)
+        print(f"  → {moved} rows moved to {target} ({rate:.0f} rows/s)")
+
+    return moved
+
+async def create_halfvec_index():
+    """Same index type and parameters as idx_project_embeddings_vector"""
+    await create_vector_index_concurrently('idx_project_embeddings_half', 'embedding_half', 'halfvec_cosine_ops')
+    print("✅ Index idx_project_embeddings_half ready")
+
+    if config.VECTOR_INDEX_TYPE != 'hnsw':
+        print("ℹ️  Size its lists for the table: POST /admin/embeddings/rebuild-index once the app serves halfvec")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Move a model_version between vector and halfvec storage")
+    parser.add_argument("model_version", nargs="?", help="Defaults to the active version")
+    parser.add_argument("--to-vector", action="store_true", help="Move back from halfvec to vector")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    if not args.model_version:
+        await active_model.refresh()
+        args.model_version = active_model.version
+
+    if not HALFVEC_ENABLED:
+        print("❌ Halfvec storage is off: set HALFVEC_STORAGE=true and restart the app to add embedding_half")
+        await engine.dispose()
+        return
+
+    to_halfvec = not args.to_vector
+    print(f"🔄 Moving '{args.model_version}' embeddings to {'halfvec' if to_halfvec else 'vector'}...")
+
+    moved = await backfill(args.model_version, to_halfvec, args.batch_size)
+    print(f"✅ Back-fill complete: {moved} rows")
+
+    if to_halfvec:
+        await create_halfvec_index()
+
+    listed = args.model_version in config.HALFVEC_MODEL_VERSIONS
+    if listed != to_halfvec:
+        action = "Add" if to_halfvec else "Remove"
+        print(f"⚠️  {action} '{args.model_version}' {'to' if to_halfvec else 'from'} HALFVEC_MODEL_VERSIONS, restart, and re-run this script")
+    print("ℹ️  Run VACUUM project_embeddings to reclaim the freed space")
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
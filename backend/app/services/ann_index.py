@@ -0,0 +1,328 @@
+"""
+Approximate Nearest Neighbour Index (IVF-PQ)
+File: app/services/ann_index.py
+
+Pure NumPy inverted-file index with product-quantized residuals, used when
+pgvector is unavailable or overloaded. A query only scores the vectors in
+the `nprobe` closest lists, so search cost grows sublinearly with the catalog.
+
+Scoring is inner product on unit vectors (= cosine similarity):
+    score(q, x) ~= q . centroid[list(x)] + sum_j q_j . codebook_j[code_j(x)]
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Filters passing at most this many times k ids are scored in full
+EXHAUSTIVE_FILTER_FACTOR = 4
+
+def kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 15,
+    spherical: bool = False,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Lloyd's k-means
+
+    spherical=True assigns by inner product and keeps centroids unit length
+    (used for the coarse quantizer on normalized embeddings).
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = assign_clusters(vectors, centroids, spherical)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Empty clusters keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+    return centroids
+
+def vector_checksums(vectors: np.ndarray) -> np.ndarray:
+    """64-bit fingerprint of each row's exact float32 values (to spot changed vectors)"""
+    words = np.ascontiguousarray(vectors, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    weights = np.random.default_rng(0).integers(1, 2 ** 63, size=words.shape[1], dtype=np.uint64) | np.uint64(1)
+    # uint64 arithmetic wraps, i.e. the sum is taken mod 2**64
+    return (words * weights).sum(axis=1, dtype=np.uint64)
+
+def sorted_membership(ids: np.ndarray, sorted_allowed: np.ndarray) -> np.ndarray:
+    """Mask of `ids` present in the sorted, non-empty `sorted_allowed`"""
+    positions = np.minimum(np.searchsorted(sorted_allowed, ids), len(sorted_allowed) - 1)
+    return sorted_allowed[positions] == ids
+
+def assign_clusters(
+    vectors: np.ndarray,
+    centroids: np.ndarray,
+    spherical: bool = False,
+    chunk_size: int = 65536
+) -> np.ndarray:
+    """Nearest centroid per vector (chunked to bound the distance matrix)"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    centroid_sq = (centroids ** 2).sum(axis=1)
+
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        products = chunk @ centroids.T
+        if spherical:
+            assignments[start:start + chunk_size] = products.argmax(axis=1)
+        else:
+            # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, ||x||^2 is constant per row
+            assignments[start:start + chunk_size] = (centroid_sq - 2 * products).argmin(axis=1)
+
+    return assignments
+
+class IVFPQIndex:
+    """
+    Inverted file index with product-quantized residuals
+
+    - Coarse quantizer: `n_lists` spherical k-means centroids
+    - Residual (vector - centroid) split into `n_subvectors` chunks,
+      each encoded as one byte (256-entry codebook per chunk)
+
+    384 floats (1536 bytes) become 48 bytes of codes + an 8-byte id.
+    """
+
+    def __init__(self, dim: int = 384, n_subvectors: int = 48):
+        if dim % n_subvectors:
+            raise ValueError("dim must be divisible by n_subvectors")
+
+        self.dim = dim
+        self.n_subvectors = n_subvectors
+        self.sub_dim = dim // n_subvectors
+
+        self.centroids: Optional[np.ndarray] = None   # (n_lists, dim)
+        self.codebooks: Optional[np.ndarray] = None   # (n_subvectors, <=256, sub_dim)
+
+        # Per inverted list: ids (n,) and codes (n, n_subvectors)
+        self.list_ids: list = []
+        self.list_codes: list = []
+        self.id_to_list: Dict[int, int] = {}
+        # vector_checksums of the vector each id was added with
+        self.checksums: Dict[int, int] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def n_lists(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.id_to_list)
+
+    # ------ BUILD ------
+
+    def train(self, vectors: np.ndarray, n_lists: Optional[int] = None, max_train: int = 50000):
+        """Fit coarse centroids and PQ codebooks on (a sample of) vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(0)
+        vectors = vectors[rng.permutation(len(vectors))[:max_train]]
+
+        # sqrt(n) lists keeps both the coarse scan and the list scans small
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        self.centroids = kmeans(vectors, n_lists, spherical=True).astype(np.float32)
+
+        # ~40 points per codeword is plenty for the 256-entry PQ codebooks
+        pq_sample = vectors[:256 * 40]
+        residuals = pq_sample - self.centroids[assign_clusters(pq_sample, self.centroids, spherical=True)]
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(self._subvectors(residuals, j)), 256, n_iter=10)
+            for j in range(self.n_subvectors)
+        ]).astype(np.float32)
+
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(self.n_lists)]
+        self.list_codes = [np.empty((0, self.n_subvectors), dtype=np.uint8) for _ in range(self.n_lists)]
+        self.id_to_list = {}
+        self.checksums = {}
+
+    def build(self, ids: np.ndarray, vectors: np.ndarray, n_lists: Optional[int] = None):
+        """Train on the given vectors and add all of them"""
+        self.train(vectors, n_lists=n_lists)
+        self.add(ids, vectors)
+
+    def _subvectors(self, vectors: np.ndarray, j: int) -> np.ndarray:
+        return vectors[:, j * self.sub_dim:(j + 1) * self.sub_dim]
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(residuals), self.n_subvectors), dtype=np.uint8)
+        for j in range(self.n_subvectors):
+            codes[:, j] = assign_clusters(np.ascontiguousarray(self._subvectors(residuals, j)), self.codebooks[j])
+        return codes
+
+    # ------ MUTATION ------
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """Add (or replace) vectors; ids already present are re-encoded"""
+        if not self.is_trained:
+            raise RuntimeError("Index must be trained before adding vectors")
+
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+
+        self.delete(ids)
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lists = assign_clusters(vectors, self.centroids, spherical=True)
+        codes = self._encode(vectors - self.centroids[lists])
+
+        for list_no in np.unique(lists):
+            members = lists == list_no
+            self.list_ids[list_no] = np.concatenate([self.list_ids[list_no], ids[members]])
+            self.list_codes[list_no] = np.concatenate([self.list_codes[list_no], codes[members]])
+
+        self.id_to_list.update(zip(ids.tolist(), lists.tolist()))
+        self.checksums.update(zip(ids.tolist(), vector_checksums(vectors).tolist()))
+
+    def delete(self, ids) -> int:
+        """Remove ids from the index, returns how many were present"""
+        by_list: Dict[int, list] = {}
+        for project_id in np.asarray(ids, dtype=np.int64).tolist():
+            list_no = self.id_to_list.pop(project_id, None)
+            self.checksums.pop(project_id, None)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(project_id)
+
+        for list_no, removed in by_list.items():
+            keep = ~np.isin(self.list_ids[list_no], removed)
+            self.list_ids[list_no] = self.list_ids[list_no][keep]
+            self.list_codes[list_no] = self.list_codes[list_no][keep]
+
+        return sum(len(removed) for removed in by_list.values())
+
+    def changed(self, ids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """Mask of ids that are missing or were added with a different vector"""
+        stored = np.fromiter((self.checksums.get(i, 0) for i in np.asarray(ids).tolist()), dtype=np.uint64, count=len(ids))
+        return stored != vector_checksums(vectors)
+
+    # ------ SEARCH ------
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int = 8,
+        allowed_ids: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k (ids, scores) for a unit-length query
+
+        Lists are visited closest-first; at least `nprobe` are scanned and
+        more are added while fewer than k candidates pass `allowed_ids`.
+        A filter passing only a few multiples of k ids skips the probing:
+        every allowed id is scored, visiting just the lists that hold them.
+        """
+        if not self.is_trained or len(self) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32)
+        coarse = self.centroids @ query
+        order = np.argsort(-coarse)
+
+        allowed = None
+        if allowed_ids is not None:
+            # Sorted once, then membership per list is a searchsorted
+            allowed = np.unique(np.asarray(allowed_ids, dtype=np.int64))
+            if len(allowed) == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            if len(allowed) <= EXHAUSTIVE_FILTER_FACTOR * k:
+                held = {self.id_to_list[i] for i in allowed.tolist() if i in self.id_to_list}
+                order = np.array([list_no for list_no in order if list_no in held], dtype=np.int64)
+                nprobe = len(order)
+
+        # ADC lookup table: table[j, c] = q_j . codebook_j[c]
+        table = np.einsum('jcd,jd->jc', self.codebooks, query.reshape(self.n_subvectors, self.sub_dim))
+        subspace = np.arange(self.n_subvectors)
+
+        found_ids, found_scores = [], []
+        found = 0
+        for probed, list_no in enumerate(order):
+            if probed >= nprobe and found >= k:
+                break
+
+            ids = self.list_ids[list_no]
+            if len(ids) == 0:
+                continue
+
+            codes = self.list_codes[list_no]
+            if allowed is not None:
+                keep = sorted_membership(ids, allowed)
+                ids, codes = ids[keep], codes[keep]
+                if len(ids) == 0:
+                    continue
+
+            found_ids.append(ids)
+            found_scores.append(coarse[list_no] + table[subspace, codes].sum(axis=1))
+            found += len(ids)
+
+        if not found_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ids = np.concatenate(found_ids)
+        scores = np.concatenate(found_scores)
+
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return ids[top], scores[top]
+
+    # ------ PERSISTENCE ------
+
+    def save(self, path: str):
+        """Write the index to a single .npz file (atomic replace)"""
+        sizes = np.array([len(ids) for ids in self.list_ids], dtype=np.int64)
+        ids = np.concatenate(self.list_ids) if self.list_ids else np.empty(0, dtype=np.int64)
+        tmp_path = f"{path}.tmp.npz"
+
+        np.savez(
+            tmp_path,
+            dim=self.dim,
+            n_subvectors=self.n_subvectors,
+            centroids=self.centroids,
+            codebooks=self.codebooks,
+            list_sizes=sizes,
+            ids=ids,
+            checksums=np.fromiter((self.checksums.get(i, 0) for i in ids.tolist()), dtype=np.uint64, count=len(ids)),
+            codes=np.concatenate(self.list_codes) if self.list_codes else np.empty((0, self.n_subvectors), dtype=np.uint8),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        """Read an index written by save()"""
+        with np.load(path) as data:
+            index = cls(dim=int(data['dim']), n_subvectors=int(data['n_subvectors']))
+            index.centroids = data['centroids']
+            index.codebooks = data['codebooks']
+
+            offsets = np.concatenate([[0], np.cumsum(data['list_sizes'])])
+            ids, codes = data['ids'], data['codes']
+            # Absent in files from before checksums: every id then counts as changed once
+            checksums = data['checksums'] if 'checksums' in data else None
+
+        index.list_ids = [ids[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        index.list_codes = [codes[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        index.id_to_list = {
+            project_id: list_no
+            for list_no, list_ids in enumerate(index.list_ids)
+            for project_id in list_ids.tolist()
+        }
+        if checksums is not None:
+            index.checksums = dict(zip(ids.tolist(), checksums.tolist()))
+        return index
@@ -0,0 +1,111 @@
+"""
+Bitmap Filter Index
+File: app/services/bitmap_index.py
+
+Precomputed row bitmaps per categorical value (difficulty, source, language,
+topic) for the in-memory vector index. Filtered semantic search combines
+them with bitwise OR/AND instead of comparing strings or querying Postgres.
+
+Like roaring bitmaps, each value picks its own container:
+- dense values: packed bitset (1 bit per row)
+- sparse values: sorted int32 row positions (cheaper below 1 row in 32)
+
+Rows can be patched in place (resize/update) when the vector index applies
+live catalog changes.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+def pack(mask: np.ndarray) -> np.ndarray:
+    return np.packbits(mask)
+
+def unpack(bits: np.ndarray, size: int) -> np.ndarray:
+    return np.unpackbits(bits, count=size).view(bool)
+
+class BitmapIndex:
+    """Value -> rows bitmaps for one (possibly multi-valued) field"""
+
+    def __init__(self, size: int, containers: Dict[str, np.ndarray]):
+        self.size = size
+        self.containers = containers
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        return value.strip().lower()
+
+    @classmethod
+    def build(cls, row_values: List[Optional[Iterable[str]]]) -> "BitmapIndex":
+        """row_values[i] = the values of row i (a list for multi-valued fields)"""
+        positions: Dict[str, list] = {}
+        for row, values in enumerate(row_values):
+            for value in values or ():
+                if value:
+                    positions.setdefault(cls.normalize(value), []).append(row)
+
+        size = len(row_values)
+        containers = {}
+        for value, rows in positions.items():
+            rows = np.unique(np.array(rows, dtype=np.int32))
+            if len(rows) * 32 < size:
+                containers[value] = rows
+            else:
+                mask = np.zeros(size, dtype=bool)
+                mask[rows] = True
+                containers[value] = pack(mask)
+        return cls(size, containers)
+
+    def bits(self, value: str) -> np.ndarray:
+        """Packed bitset of the rows having `value`"""
+        container = self.containers.get(self.normalize(value))
+        if container is None:
+            return pack(np.zeros(self.size, dtype=bool))
+        if container.dtype == np.int32:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[container] = True
+            return pack(mask)
+        return container
+
+    def any_of(self, values: Iterable[str]) -> np.ndarray:
+        """Packed bitset of the rows having at least one of `values`"""
+        result = None
+        for value in values:
+            bits = self.bits(value)
+            result = bits.copy() if result is None else np.bitwise_or(result, bits, out=result)
+        return result if result is not None else pack(np.zeros(self.size, dtype=bool))
+
+    # ------ INCREMENTAL UPDATES ------
+
+    def resize(self, size: int):
+        """Grow to `size` rows (new rows have no values)"""
+        extra_bytes = (size + 7) // 8 - (self.size + 7) // 8
+        if extra_bytes > 0:
+            padding = np.zeros(extra_bytes, dtype=np.uint8)
+            for value, container in self.containers.items():
+                if container.dtype == np.uint8:
+                    self.containers[value] = np.concatenate([container, padding])
+        self.size = size
+
+    def update(self, row: int, old_values: Optional[Iterable[str]], new_values: Optional[Iterable[str]]):
+        """Move `row` from its old values to its new ones"""
+        old = {self.normalize(v) for v in old_values or () if v}
+        new = {self.normalize(v) for v in new_values or () if v}
+
+        for value in old - new:
+            container = self.containers.get(value)
+            if container is None:
+                continue
+            if container.dtype == np.int32:
+                self.containers[value] = container[container != row]
+            else:
+                container[row >> 3] &= ~np.uint8(0x80 >> (row & 7))
+
+        for value in new - old:
+            container = self.containers.get(value)
+            if container is None:
+                self.containers[value] = np.array([row], dtype=np.int32)
+            elif container.dtype == np.int32:
+                self.containers[value] = np.union1d(container, [row]).astype(np.int32)
+            else:
+                container[row >> 3] |= np.uint8(0x80 >> (row & 7))
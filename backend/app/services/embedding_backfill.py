@@ -0,0 +1,140 @@
+"""
+Embedding Backfill
+File: app/services/embedding_backfill.py
+
+Streams the catalog through the encoder in fixed-size chunks instead of
+loading every stale project at once:
+
+    repeat:
+        read the next N projects (keyset: id > last id, ORDER BY id LIMIT N)
+        encode the stale ones among them
+        write them with one INSERT ... ON CONFLICT statement
+        save the checkpoint (last id) in the same transaction
+
+Memory stays at one chunk of texts and vectors whatever the backlog size.
+A crashed or interrupted run resumes after the last committed chunk
+(embedding_backfill_checkpoints); a finished pass removes its checkpoint,
+so the next run starts over and picks up later edits. Unchanged projects
+are skipped by content_hash (stale_project_embeddings_page).
+"""
+
+import asyncio
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import config
+from app.database.sql_engine import get_db
+from app.database.tables import embedding_backfill_checkpoints
+from app.services.embedding_storage import (
+    embedding_values,
+    stale_project_embeddings_page,
+    upsert_embeddings_statement
+)
+from app.services.embedding_versions import active_model
+
+EncodeBatch = Callable[[List[str]], List[List[float]]]
+
+# ------ CHECKPOINTS ------
+
+async def load_checkpoint(db, model_version: str):
+    result = await db.execute(
+        select(embedding_backfill_checkpoints)
+        .where(embedding_backfill_checkpoints.c.model_version == model_version)
+    )
+    return result.first()
+
+async def save_checkpoint(db, model_version: str, last_project_id: int, rows_scanned: int, rows_written: int):
+    values = {
+        'last_project_id': last_project_id,
+        'rows_scanned': rows_scanned,
+        'rows_written': rows_written
+    }
+    await db.execute(
+        pg_insert(embedding_backfill_checkpoints)
+        .values(model_version=model_version, **values)
+        .on_conflict_do_update(
+            index_elements=[embedding_backfill_checkpoints.c.model_version],
+            set_={**values, 'updated_at': func.now()}
+        )
+    )
+
+async def clear_checkpoint(db, model_version: str):
+    await db.execute(
+        delete(embedding_backfill_checkpoints)
+        .where(embedding_backfill_checkpoints.c.model_version == model_version)
+    )
+
+# ------ BACKFILL ------
+
+async def backfill_project_embeddings(
+    encode_batch: EncodeBatch,
+    model_version: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    restart: bool = False
+) -> dict:
+    """
+    Encode and store every missing or stale embedding of `model_version`
+    (default: the active one), resuming from its checkpoint
+
+    encode_batch is a blocking texts -> vectors function (run in a thread),
+    e.g. EmbeddingGenerator.encode_batch. restart=True ignores the
+    checkpoint. Returns pass totals and this run's rows/s.
+    """
+    model_version = model_version or active_model.version
+    chunk_size = chunk_size or config.EMBEDDING_BACKFILL_CHUNK_SIZE
+
+    async with get_db() as db:
+        if restart:
+            await clear_checkpoint(db, model_version)
+        checkpoint = await load_checkpoint(db, model_version)
+
+    after_id, scanned, written = 0, 0, 0
+    if checkpoint:
+        after_id, scanned, written = checkpoint.last_project_id, checkpoint.rows_scanned, checkpoint.rows_written
+        print(f"↩️  Resuming '{model_version}' after project {after_id} ({scanned} checked, {written} written)")
+
+    run_scanned, run_written = 0, 0
+    started = time.perf_counter()
+
+    while True:
+        async with get_db() as db:
+            last_id, checked, stale = await stale_project_embeddings_page(db, after_id, chunk_size, model_version)
+        if last_id is None:
+            break
+
+        embeddings = await asyncio.to_thread(encode_batch, [text for _, text in stale]) if stale else []
+
+        async with get_db() as db:
+            if stale:
+                # One multi-row statement per chunk
+                await db.execute(upsert_embeddings_statement().values([
+                    {'project_id': project_id, **embedding_values(embedding, model_version=model_version, text=text)}
+                    for (project_id, text), embedding in zip(stale, embeddings)
+                ]))
+            await save_checkpoint(db, model_version, last_id, scanned + checked, written + len(stale))
+
+        # Counted once committed, so a resumed run continues the same totals
+        after_id = last_id
+        scanned += checked
+        written += len(stale)
+        run_scanned += checked
+        run_written += len(stale)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"  → up to project {last_id}: {run_scanned} checked, {run_written} written "
+              f"({run_scanned / elapsed:.0f} rows/s checked, {run_written / elapsed:.0f} rows/s written)")
+
+    async with get_db() as db:
+        await clear_checkpoint(db, model_version)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'model_version': model_version,
+        'scanned': scanned,
+        'written': written,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(run_written / max(elapsed, 1e-9), 1)
+    }
@@ -0,0 +1,96 @@
+"""
+Query Embedding Cache
+File: app/services/embedding_cache.py
+
+Bounded LRU + TTL cache of query embeddings keyed on (model_version,
+normalized text). Popular searches ("react", "machine learning") and
+unchanged profile query texts from build_user_query_text are encoded once
+and then served without a transformer forward pass.
+
+The normalized text is only the key; callers encode the original text.
+Normalization applies NFKC and collapses whitespace, which no tokenizer
+sees. Case is folded only for uncased models (fold_case, per model name in
+UNCASED_MODEL_NAMES); a cased model must not share one vector between
+"Go" and "go".
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+Vector = List[float]
+
+def normalize_text(text: str, fold_case: bool = False) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join((text.lower() if fold_case else text).split())
+
+class EmbeddingCache:
+    """
+    At most `max_entries` vectors, each valid for `ttl_seconds`
+
+    Cached vectors are shared between callers and must not be mutated.
+    max_entries=0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Vector]]" = OrderedDict()
+        # encode() may run in worker threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, model_version: str, text: str) -> Optional[Vector]:
+        """Cached vector of already normalized `text`, or None (counted as a miss)"""
+        key = (model_version, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, model_version: str, text: str, vector: Vector):
+        if not self.enabled:
+            return
+        key = (model_version, text)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
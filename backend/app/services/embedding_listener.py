@@ -0,0 +1,154 @@
+"""
+Embedding Change Listener
+File: app/services/embedding_listener.py
+
+Keeps the in-memory vector index current between reloads. A trigger on
+project_embeddings (app/database/embedding_notify.sql) NOTIFYs every
+committed write; this listener collects the changed project ids for a short
+debounce window and patches them into the index in one batch
+(ProjectVectorIndex.apply_changes).
+
+Writes for other model versions (a shadow build,
+app/scripts/build_embedding_version.py) are ignored.
+
+Started from the lifespan in app/main.py. While connected, the index skips
+its TTL reload. Changes made before a connection is established (or while
+it was down) were not notified, so the index is invalidated (full reload)
+on every connect.
+"""
+
+import asyncio
+import json
+from typing import Optional, Set
+
+import asyncpg
+
+from app.core.config import config
+from app.database.sql_engine import engine, get_db
+from app.services.vector_index import ProjectVectorIndex, project_index
+
+CHANNEL = "project_embeddings_changed"
+
+# Ids per apply_changes call (bounds the IN (...) list)
+PATCH_BATCH_SIZE = 1000
+
+class EmbeddingChangeListener:
+    """LISTEN on CHANNEL and apply debounced batches of changes to an index"""
+
+    def __init__(
+        self,
+        index: ProjectVectorIndex,
+        debounce_seconds: float = 0.5,
+        reconnect_seconds: float = 5.0
+    ):
+        self.index = index
+        index.live_updates = lambda: self.is_listening
+        self.debounce_seconds = debounce_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self._pending: Set[int] = set()
+        self._wake = asyncio.Event()
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_listening(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+
+    # ------ NOTIFICATIONS ------
+
+    def _on_notify(self, conn, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+            project_id = int(change['project_id'])
+        except (ValueError, KeyError, TypeError):
+            print(f"⚠️  Ignoring malformed {CHANNEL} payload: {payload!r}")
+            return
+        if change.get('model_version', self.index.model_version) != self.index.model_version:
+            return
+        self._pending.add(project_id)
+        self._wake.set()
+
+    def _on_terminate(self, conn):
+        self._wake.set()
+
+    async def _connect(self):
+        # Same connection parameters as init_db; LISTEN needs a dedicated
+        # connection outside the SQLAlchemy pool
+        url = engine.url
+        self._conn = await asyncpg.connect(
+            host=url.host or 'localhost',
+            port=url.port or 5432,
+            user=url.username,
+            password=url.password,
+            database=url.database
+        )
+        self._conn.add_termination_listener(self._on_terminate)
+        await self._conn.add_listener(CHANNEL, self._on_notify)
+
+    async def _close(self):
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+    # ------ MAIN LOOP ------
+
+    async def _run(self):
+        while True:
+            try:
+                await self._connect()
+                print(f"✅ Listening on {CHANNEL} for vector index updates")
+
+                # Anything written before LISTEN (or while we were away) was not notified
+                self.index.invalidate()
+
+                while self.is_listening:
+                    await self._wake.wait()
+                    await asyncio.sleep(self.debounce_seconds)
+                    self._wake.clear()
+                    await self._flush()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Embedding listener error: {e}")
+
+            await self._close()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def _flush(self):
+        """Apply every pending id, PATCH_BATCH_SIZE at a time"""
+        project_ids, self._pending = sorted(self._pending), set()
+        if not project_ids:
+            return
+
+        totals = {'replaced': 0, 'appended': 0, 'tombstoned': 0}
+        async with get_db() as db:
+            for start in range(0, len(project_ids), PATCH_BATCH_SIZE):
+                counts = await self.index.apply_changes(db, project_ids[start:start + PATCH_BATCH_SIZE])
+                for key, value in counts.items():
+                    totals[key] += value
+
+        print(
+            f"🔄 Patched vector index: {totals['appended']} appended, "
+            f"{totals['replaced']} replaced, {totals['tombstoned']} tombstoned"
+        )
+
+# Shared per-process instance (started in app/main.py)
+embedding_listener = EmbeddingChangeListener(
+    project_index,
+    debounce_seconds=config.VECTOR_INDEX_PATCH_DEBOUNCE_MS / 1000
+)
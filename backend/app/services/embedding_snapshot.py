@@ -0,0 +1,145 @@
+"""
+Embedding Snapshots
+File: app/services/embedding_snapshot.py
+
+Exports project_embeddings to an on-disk snapshot that every uvicorn worker
+opens with np.memmap, so N workers share one page-cache copy of the catalog
+instead of N private copies.
+
+Layout:
+    <snapshot_dir>/CURRENT                    -> name of the published version
+    <snapshot_dir>/<version>/embeddings.npy   (count, 384) float32 (float16 for halfvec models), unit rows
+    <snapshot_dir>/<version>/ids.npy          (count,) int64, ascending
+    <snapshot_dir>/<version>/header.json      version, model, dim, dtype, count
+
+Publishing writes a new version directory first and then atomically
+replaces CURRENT, so readers never see a half-written snapshot.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, func, text
+
+from app.database.sql_engine import get_db
+from app.database.tables import project_embeddings
+from app.services.embedding_storage import STORED_COLUMNS, has_embedding, resident_dtype, row_vector
+from app.services.embedding_versions import active_model
+
+SNAPSHOT_DIM = 384
+POINTER_FILE = "CURRENT"
+
+def current_snapshot_version(snapshot_dir: str) -> Optional[str]:
+    """Version name CURRENT points at, or None if nothing is published"""
+    try:
+        with open(os.path.join(snapshot_dir, POINTER_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def open_snapshot(snapshot_dir: str, version: str) -> Tuple[dict, np.ndarray, np.ndarray]:
+    """
+    Map a snapshot read-only: (header, ids, embeddings)
+
+    Nothing is copied; pages are shared with every other process that
+    maps the same files.
+    """
+    path = os.path.join(snapshot_dir, version)
+    with open(os.path.join(path, "header.json")) as f:
+        header = json.load(f)
+
+    ids = np.load(os.path.join(path, "ids.npy"), mmap_mode='r')
+    embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode='r')
+    return header, ids, embeddings
+
+async def export_snapshot(
+    snapshot_dir: str,
+    model_version: Optional[str] = None,
+    batch_size: int = 5000,
+    keep: int = 2
+) -> dict:
+    """
+    Write project_embeddings to a new snapshot version and publish it
+
+    Rows are streamed straight into the memory-mapped output file, so
+    memory use does not grow with the catalog. The newest `keep`
+    versions are kept; workers still mapping an older one keep working
+    because unlinked files stay readable until unmapped.
+    """
+    model_version = model_version or active_model.version
+    dtype = np.dtype(resident_dtype(model_version))
+    base_filter = has_embedding(model_version)
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = os.path.join(snapshot_dir, version)
+
+    async with get_db() as db:
+        # The count and the scan must see the same rows
+        await db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"))
+
+        result = await db.execute(
+            select(func.count()).select_from(project_embeddings).where(base_filter)
+        )
+        count = result.scalar()
+
+        if count == 0:
+            raise ValueError("No embeddings to snapshot")
+        os.makedirs(path)
+
+        embeddings = np.lib.format.open_memmap(
+            os.path.join(path, "embeddings.npy"), mode='w+', dtype=dtype, shape=(count, SNAPSHOT_DIM)
+        )
+        ids = np.lib.format.open_memmap(
+            os.path.join(path, "ids.npy"), mode='w+', dtype=np.int64, shape=(count,)
+        )
+
+        written = 0
+        stream = await db.stream(
+            select(project_embeddings.c.project_id, *STORED_COLUMNS)
+            .where(base_filter)
+            .order_by(project_embeddings.c.project_id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for rows in stream.partitions(batch_size):
+            batch = np.array([row_vector(row) for row in rows], dtype=np.float32)
+            norms = np.linalg.norm(batch, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+
+            embeddings[written:written + len(rows)] = batch / norms
+            ids[written:written + len(rows)] = [row.project_id for row in rows]
+            written += len(rows)
+
+    embeddings.flush()
+    ids.flush()
+    del embeddings, ids
+
+    header = {
+        "version": version,
+        "model_version": model_version,
+        "dim": SNAPSHOT_DIM,
+        "dtype": dtype.name,
+        "count": count,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    with open(os.path.join(path, "header.json"), "w") as f:
+        json.dump(header, f)
+
+    # Atomic publish: readers see either the old or the new pointer
+    pointer_tmp = os.path.join(snapshot_dir, f"{POINTER_FILE}.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(snapshot_dir, POINTER_FILE))
+
+    # Prune old versions (names sort chronologically)
+    versions = sorted(
+        name for name in os.listdir(snapshot_dir)
+        if os.path.isdir(os.path.join(snapshot_dir, name))
+    )
+    for old_version in versions[:-keep]:
+        shutil.rmtree(os.path.join(snapshot_dir, old_version), ignore_errors=True)
+
+    return header
@@ -0,0 +1,215 @@
+"""
+Embedding Storage
+File: app/services/embedding_storage.py
+
+Where a project embedding lives depends on its model_version:
+- vector(384) in project_embeddings.embedding (float32, the default)
+- halfvec(384) in project_embeddings.embedding_half (float16) for the
+  versions listed in HALFVEC_MODEL_VERSIONS. The column only exists when
+  halfvec storage is enabled (HALFVEC_ENABLED, app/database/tables.py)
+
+Exactly one of the two columns is set per row. Half precision halves table
+size, WAL, backups, transfer and index build time; unit-length MiniLM
+vectors keep ~3 significant digits per component, well below the gaps
+between neighbouring cosine scores.
+
+The in-process readers select both columns and use whichever is set
+(row_vector), so they serve every row of a table that is mid-migration.
+The pgvector search path ranks one column through its index, so until
+app/scripts/migrate_halfvec.py finishes it only sees the rows already moved.
+
+Rows are keyed by (project_id, model_version); every helper defaults to the
+version being served (app/services/embedding_versions.py).
+
+content_hash fingerprints the exact text and model_version a vector was
+computed from. Backfill and regenerate paths only re-encode projects whose
+fingerprint changed (stale_project_embeddings).
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import config
+from app.database.tables import HALFVEC_ENABLED, project_embeddings, projects
+from app.services.embedding_versions import active_model
+
+def uses_halfvec(model_version: Optional[str] = None) -> bool:
+    return (model_version or active_model.version) in config.HALFVEC_MODEL_VERSIONS
+
+def embedding_column(model_version: Optional[str] = None):
+    """Column holding the embeddings of `model_version` (default: the active one)"""
+    if uses_halfvec(model_version):
+        return project_embeddings.c.embedding_half
+    return project_embeddings.c.embedding
+
+def cosine_index(model_version: Optional[str] = None) -> Tuple[str, str, str]:
+    """(index name, column name, operator class) of the pgvector index to use"""
+    if uses_halfvec(model_version):
+        return 'idx_project_embeddings_half', 'embedding_half', 'halfvec_cosine_ops'
+    return 'idx_project_embeddings_vector', 'embedding', 'vector_cosine_ops'
+
+def embedding_values(
+    embedding: List[float],
+    model_version: Optional[str] = None,
+    text: Optional[str] = None
+) -> dict:
+    """
+    project_embeddings values for an insert/update (the other column is cleared)
+
+    Pass the embedded `text` to record its content_hash.
+    """
+    model_version = model_version or active_model.version
+    values = {
+        'content_hash': content_hash(text, model_version) if text is not None else None,
+        'model_version': model_version
+    }
+    if uses_halfvec(model_version):
+        return {'embedding': None, 'embedding_half': embedding, **values}
+    if HALFVEC_ENABLED:
+        values['embedding_half'] = None
+    return {'embedding': embedding, **values}
+
+def upsert_embeddings_statement():
+    """
+    INSERT ... ON CONFLICT DO UPDATE for rows of
+    {'project_id': ..., **embedding_values(...)} (one or executemany)
+    """
+    stmt = pg_insert(project_embeddings)
+    return stmt.on_conflict_do_update(
+        index_elements=[project_embeddings.c.project_id, project_embeddings.c.model_version],
+        set_={
+            **{column.name: stmt.excluded[column.name] for column in STORED_COLUMNS},
+            'content_hash': stmt.excluded.content_hash,
+            'updated_at': func.now()
+        }
+    )
+
+# Select these and pass the row to row_vector()
+STORED_COLUMNS = (project_embeddings.c.embedding,) + ((project_embeddings.c.embedding_half,) if HALFVEC_ENABLED else ())
+
+# ------ CONTENT HASH ------
+
+# Project columns project_embedding_text() reads
+TEXT_COLUMNS = (
+    projects.c.title,
+    projects.c.description,
+    projects.c.topics,
+    projects.c.language,
+    projects.c.difficulty
+)
+
+def project_embedding_text(project: Dict) -> str:
+    """The text a project's embedding is computed from (one builder for every path)"""
+    parts = []
+
+    # Title (most important)
+    parts.append(project.get('title') or '')
+
+    # Description
+    if project.get('description'):
+        parts.append(project['description'][:300])
+
+    # Topics
+    if project.get('topics'):
+        parts.append(f"Topics: {', '.join(project['topics'])}")
+
+    # Language
+    if project.get('language'):
+        parts.append(f"Language: {project['language']}")
+
+    # Difficulty
+    if project.get('difficulty'):
+        parts.append(f"Difficulty: {project['difficulty']}")
+
+    return ". ".join(parts)
+
+def content_hash(text: str, model_version: Optional[str] = None) -> str:
+    model_version = model_version or active_model.version
+    return hashlib.sha256(f"{model_version}\n{text}".encode("utf-8")).hexdigest()
+
+def _project_texts_query(model_version: str):
+    """Projects with their text columns and stored content_hash, in id order"""
+    return (
+        select(projects.c.id, *TEXT_COLUMNS, project_embeddings.c.content_hash)
+        .select_from(projects.outerjoin(
+            project_embeddings,
+            and_(project_embeddings.c.project_id == projects.c.id, project_embeddings.c.model_version == model_version)
+        ))
+        .order_by(projects.c.id)
+    )
+
+def _stale_rows(rows, model_version: str) -> List[Tuple[int, str]]:
+    stale = []
+    for row in rows:
+        text = project_embedding_text(row)
+        if row['content_hash'] != content_hash(text, model_version):
+            stale.append((row['id'], text))
+    return stale
+
+async def stale_project_embeddings(
+    db: AsyncSession,
+    project_ids: Optional[Sequence[int]] = None,
+    model_version: Optional[str] = None
+) -> List[Tuple[int, str]]:
+    """
+    (project_id, embedding text) of projects needing a new embedding
+    for `model_version`
+
+    Missing rows and rows whose project text changed since they were
+    computed (including rows written before content_hash existed).
+    """
+    model_version = model_version or active_model.version
+    stmt = _project_texts_query(model_version)
+    if project_ids is not None:
+        stmt = stmt.where(projects.c.id.in_(list(project_ids)))
+
+    return _stale_rows((await db.execute(stmt)).mappings(), model_version)
+
+async def stale_project_embeddings_page(
+    db: AsyncSession,
+    after_id: int,
+    limit: int,
+    model_version: Optional[str] = None
+) -> Tuple[Optional[int], int, List[Tuple[int, str]]]:
+    """
+    One keyset page of stale_project_embeddings: checks the next `limit`
+    projects with id > after_id
+
+    Returns (last project id checked, projects checked, stale rows among
+    them); the id is None once there are no projects left.
+    """
+    model_version = model_version or active_model.version
+    result = await db.execute(
+        _project_texts_query(model_version)
+        .where(projects.c.id > after_id)
+        .limit(limit)
+    )
+    rows = result.mappings().all()
+    if not rows:
+        return None, 0, []
+    return rows[-1]['id'], len(rows), _stale_rows(rows, model_version)
+
+def resident_dtype(model_version: Optional[str] = None):
+    """dtype of the in-process copy: float16 when stored as halfvec"""
+    return np.float16 if uses_halfvec(model_version) else np.float32
+
+def has_embedding(model_version: Optional[str] = None):
+    """Rows of `model_version` (default: the active one) with a stored vector"""
+    return and_(
+        project_embeddings.c.model_version == (model_version or active_model.version),
+        or_(*[column.isnot(None) for column in STORED_COLUMNS])
+    )
+
+def row_vector(row) -> Optional[np.ndarray]:
+    """The stored vector of a row selected with STORED_COLUMNS"""
+    if row.embedding is not None:
+        return np.asarray(row.embedding)
+    embedding_half = getattr(row, 'embedding_half', None)
+    if embedding_half is not None:
+        return embedding_half.to_numpy()
+    return None
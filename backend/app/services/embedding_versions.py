@@ -0,0 +1,162 @@
+"""
+Embedding Model Versions
+File: app/services/embedding_versions.py
+
+project_embeddings holds one row per (project_id, model_version), so several
+encoders can coexist. embedding_models registers each model_version with
+the sentence-transformers model that produced it, and the single-row
+active_embedding_model table points at the version being served.
+
+Lifecycle of a new version (app/scripts/build_embedding_version.py):
+1. register it as 'building' and backfill its rows in the background
+   (shadow build; serving keeps using the active version)
+2. mark it 'ready' once every project has a row
+3. activate: one UPDATE of the pointer row
+
+Every API worker polls the pointer (EMBEDDING_VERSION_POLL_SECONDS). On a
+change it first runs the registered hooks (warm the new encoder) and then
+switches, so queries, stored rows and indexes always use the same version.
+Without a pointer row, config.EMBEDDING_MODEL_VERSION is served with the
+default model.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import config
+from app.database.sql_engine import get_db
+from app.database.tables import active_embedding_model, embedding_models, project_embeddings, projects
+from app.services.inference_pool import MODEL_NAME
+
+ChangeHook = Callable[[str, str], Awaitable[None]]
+
+def model_options(model_name: str) -> dict:
+    """load_model()/InferencePool keyword arguments for `model_name`"""
+    # The ONNX export (app/scripts/export_onnx_model.py) is of the default model only
+    backend = config.EMBEDDING_BACKEND if model_name == MODEL_NAME else 'torch'
+    return {
+        'model_name': model_name,
+        'backend': backend,
+        'onnx_dir': config.ONNX_MODEL_DIR,
+        'quantized': config.ONNX_QUANTIZED
+    }
+
+class ActiveEmbeddingModel:
+    """This process's view of the active version pointer"""
+
+    def __init__(self, poll_seconds: float = 10.0):
+        self.poll_seconds = poll_seconds
+        self.version = config.EMBEDDING_MODEL_VERSION
+        self._model_names: Dict[str, str] = {config.EMBEDDING_MODEL_VERSION: MODEL_NAME}
+        self._hooks: List[ChangeHook] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def model_name(self) -> str:
+        return self.model_name_for(self.version)
+
+    def model_name_for(self, model_version: Optional[str] = None) -> str:
+        return self._model_names.get(model_version or self.version, MODEL_NAME)
+
+    def on_change(self, hook: ChangeHook):
+        """Run `hook(old_version, new_version)` before this process switches"""
+        self._hooks.append(hook)
+
+    async def refresh(self) -> bool:
+        """Re-read the registry and the pointer; True if the active version changed"""
+        async with get_db() as db:
+            result = await db.execute(select(embedding_models.c.model_version, embedding_models.c.model_name))
+            names = {row.model_version: row.model_name for row in result}
+            result = await db.execute(select(active_embedding_model.c.model_version))
+            version = result.scalar() or config.EMBEDDING_MODEL_VERSION
+
+        self._model_names = {config.EMBEDDING_MODEL_VERSION: MODEL_NAME, **names}
+        if version == self.version:
+            return False
+
+        old_version = self.version
+        for hook in self._hooks:
+            await hook(old_version, version)
+        self.version = version
+        print(f"🔀 Serving embedding model version '{version}' ({self.model_name}), was '{old_version}'")
+        return True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Embedding version poll failed: {e}")
+
+# ------ REGISTRY ------
+
+async def register_version(db: AsyncSession, model_version: str, model_name: str):
+    """Add (or re-open) a version for a shadow build"""
+    await db.execute(
+        pg_insert(embedding_models)
+        .values(model_version=model_version, model_name=model_name, status='building')
+        .on_conflict_do_update(
+            index_elements=[embedding_models.c.model_version],
+            set_={'model_name': model_name, 'status': 'building', 'updated_at': func.now()}
+        )
+    )
+
+async def set_status(db: AsyncSession, model_version: str, status: str):
+    await db.execute(
+        embedding_models.update()
+        .where(embedding_models.c.model_version == model_version)
+        .values(status=status, updated_at=func.now())
+    )
+
+async def missing_rows(db: AsyncSession, model_version: str) -> int:
+    """Projects without a row for `model_version`"""
+    result = await db.execute(
+        select(func.count())
+        .select_from(projects.outerjoin(
+            project_embeddings,
+            (project_embeddings.c.project_id == projects.c.id) & (project_embeddings.c.model_version == model_version)
+        ))
+        .where(project_embeddings.c.project_id.is_(None))
+    )
+    return result.scalar()
+
+async def activate_version(db: AsyncSession, model_version: str):
+    """The atomic cutover: point serving at `model_version` (must be 'ready')"""
+    result = await db.execute(
+        select(embedding_models.c.status).where(embedding_models.c.model_version == model_version)
+    )
+    status = result.scalar()
+    if status != 'ready':
+        raise ValueError(f"Version '{model_version}' is {status or 'not registered'}, not ready")
+
+    await db.execute(
+        pg_insert(active_embedding_model)
+        .values(id=True, model_version=model_version)
+        .on_conflict_do_update(
+            index_elements=[active_embedding_model.c.id],
+            set_={'model_version': model_version, 'activated_at': func.now()}
+        )
+    )
+
+# Shared per-process instance (polling started in app/main.py)
+active_model = ActiveEmbeddingModel(poll_seconds=config.EMBEDDING_VERSION_POLL_SECONDS)
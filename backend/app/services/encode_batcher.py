@@ -0,0 +1,127 @@
+"""
+Encode Micro-Batcher
+File: app/services/encode_batcher.py
+
+SentenceTransformer.encode is CPU-bound and synchronous; called per request
+on the event loop it stalls every other request. EncodeBatcher queues
+concurrent texts, gathers them for up to `max_wait_ms` or `max_batch_size`
+texts, and runs one batched forward pass (in a worker thread, or in the
+inference pool, see app/services/inference_pool.py). Each caller awaits its
+own future.
+
+At most `concurrency` batches run at once (1 for the in-process model, one
+per pool worker). While they run, new texts queue up and form the next
+batch, so under load batches fill without waiting at all.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+Vector = List[float]
+
+class EncodeBatcher:
+    """Coalesces concurrent encode calls into batched awaits of `encode_batch`"""
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], Awaitable[List[Vector]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        concurrency: int = 1
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.concurrency = concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        # Counters for tuning max_wait_ms / max_batch_size
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_worker(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._run())
+
+    async def encode(self, text: str) -> Vector:
+        """Embedding of one text, batched with concurrent callers"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[Vector]:
+        """Embeddings of several texts (a full batch on its own skips the queue)"""
+        if len(texts) >= self.max_batch_size:
+            return await self.encode_batch(texts)
+        return list(await asyncio.gather(*[self.encode(text) for text in texts]))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------ WORKER ------
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Next batch: wait for one text, then gather until full or max_wait elapses"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Already queued texts join without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            # Only collect the next batch once it can start right away
+            await self._slots.acquire()
+            batch = await self._collect()
+
+            # Callers that gave up (request cancelled) are not encoded
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._encode(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _encode(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            vectors = await self.encode_batch([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        self.batches += 1
+        self.texts += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -0,0 +1,167 @@
+"""
+Embedding Inference Pool
+File: app/services/inference_pool.py
+
+Hosts the MiniLM model in dedicated local worker processes. The API's pools
+live in one shared inference server (app/services/inference_server.py), so
+API processes never import torch or load the model, and inference
+parallelism (EMBEDDING_INFERENCE_WORKERS) is sized independently of HTTP
+concurrency and of the number of API workers; a slow forward pass runs on
+its own cores instead of competing with request handling.
+
+Only texts and float32 arrays cross the process boundary.
+
+load_model() picks the inference backend: the PyTorch SentenceTransformer
+or the exported ONNX graph (app/services/onnx_encoder.py).
+
+Workers run in spawned processes (app/services/process_pool.py).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.length_buckets import encode_bucketed
+from app.services.process_pool import spawn_executor
+
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+def load_model(
+    model_name: str = MODEL_NAME,
+    backend: str = 'torch',
+    onnx_dir: Optional[str] = None,
+    quantized: bool = True,
+    threads: int = 0
+):
+    """
+    Encoder with SentenceTransformer's encode() interface
+
+    backend 'torch': SentenceTransformer (torch is only imported here)
+    backend 'onnx': OnnxEncoder on `onnx_dir`, int8 weights if `quantized`
+    threads > 0 caps the intra-op threads.
+    """
+    if backend == 'onnx':
+        if not onnx_dir:
+            raise ValueError("EMBEDDING_BACKEND=onnx needs ONNX_MODEL_DIR (app/scripts/export_onnx_model.py)")
+        from app.services.onnx_encoder import OnnxEncoder
+        return OnnxEncoder(onnx_dir, quantized=quantized, threads=threads)
+
+    if backend != 'torch':
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+# ------ WORKER SIDE ------
+
+_model = None
+_token_budget = 0
+
+def _init_worker(model_options: dict, token_budget: int):
+    global _model, _token_budget
+    _model = load_model(**model_options)
+    _token_budget = token_budget
+    print(f"✅ Inference worker {os.getpid()} loaded {model_options['model_name']} ({model_options['backend']})")
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """Normalized float32 embeddings, one row per text"""
+    return encode_bucketed(_model, texts, _token_budget)
+
+# ------ FRONT SIDE ------
+
+class InferencePool:
+    """
+    `n_workers` processes each holding one copy of the model
+
+    Large inputs are sorted by length and split into `chunk_size` pieces,
+    so they spread across the workers and each worker's length buckets
+    (`token_budget` padded tokens per pass) pad little.
+    """
+
+    def __init__(
+        self,
+        n_workers: int,
+        model_name: str = MODEL_NAME,
+        backend: str = 'torch',
+        onnx_dir: Optional[str] = None,
+        quantized: bool = True,
+        threads: int = 0,
+        token_budget: int = 8192,
+        chunk_size: int = 256
+    ):
+        self.n_workers = n_workers
+        self.model_options = {
+            'model_name': model_name,
+            'backend': backend,
+            'onnx_dir': onnx_dir,
+            'quantized': quantized,
+            # Split the cores between workers instead of oversubscribing them
+            'threads': threads or max(1, (os.cpu_count() or 1) // n_workers)
+        }
+        self.token_budget = token_budget
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = spawn_executor(
+                self.n_workers,
+                initializer=_init_worker,
+                initargs=(self.model_options, self.token_budget)
+            )
+        return self._executor
+
+    def _chunks(self, texts: List[str]) -> Tuple[np.ndarray, List[List[str]]]:
+        """(order, chunks): chunks of texts sorted by character length"""
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        ordered = [texts[i] for i in order]
+        return order, [ordered[i:i + self.chunk_size] for i in range(0, len(ordered), self.chunk_size)]
+
+    @staticmethod
+    def _restore(order: np.ndarray, parts: List[np.ndarray]) -> np.ndarray:
+        ordered = np.concatenate(parts)
+        embeddings = np.empty_like(ordered)
+        embeddings[order] = ordered
+        return embeddings
+
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Blocking encode (scripts and other synchronous callers)"""
+        if not texts:
+            return []
+        order, chunks = self._chunks(texts)
+        return self._restore(order, list(self._pool().map(encode_texts, chunks))).tolist()
+
+    async def encode_array_async(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        loop = asyncio.get_running_loop()
+        order, chunks = self._chunks(texts)
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(self._pool(), encode_texts, chunk)
+            for chunk in chunks
+        ])
+        return self._restore(order, parts)
+
+    async def encode_batch_async(self, texts: List[str]) -> List[List[float]]:
+        return (await self.encode_array_async(texts)).tolist()
+
+    async def warm_up(self):
+        """Start every worker (each loads the model) and run one encode on each"""
+        loop = asyncio.get_running_loop()
+        # Tasks submitted while no worker is idle spawn the next worker
+        await asyncio.gather(*[
+            loop.run_in_executor(self._pool(), encode_texts, ["warm up"])
+            for _ in range(self.n_workers)
+        ])
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
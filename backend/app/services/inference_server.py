@@ -0,0 +1,227 @@
+"""
+Shared Inference Server
+File: app/services/inference_server.py
+
+One standalone process (app/scripts/inference_server.py) owns the
+inference pools (app/services/inference_pool.py); every API worker encodes
+through it over a Unix socket with InferenceClient. The host holds one set
+of model copies, EMBEDDING_INFERENCE_WORKERS of them, however many uvicorn
+workers run, and concurrent requests from all of them share those workers.
+
+Wire format, one frame = 4-byte big-endian length + body:
+    request:  JSON {"op": "encode" | "warm_up" | "release", "model": {...}, "texts": [...]}
+    response: JSON {"rows": n, "dim": d} then n*d float32 bytes,
+              or JSON {"error": "..."} alone
+
+"model" holds the load_model() options of one model (model_options());
+the server starts a pool per distinct options on first use.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import struct
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.inference_pool import InferencePool
+
+_LENGTH = struct.Struct(">I")
+
+# ------ FRAMING ------
+
+def _frame(body: bytes) -> bytes:
+    return _LENGTH.pack(len(body)) + body
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Inference server closed the connection")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    (length,) = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return _recv_exactly(sock, length)
+
+def _vectors(header: bytes, payload: Optional[bytes]) -> np.ndarray:
+    meta = json.loads(header)
+    return np.frombuffer(payload, dtype=np.float32).reshape(meta['rows'], meta['dim'])
+
+# ------ SERVER ------
+
+class InferenceServer:
+    """Serves encode requests from every API worker on `socket_path`"""
+
+    def __init__(self, socket_path: str, n_workers: int, threads: int = 0, token_budget: int = 8192):
+        self.socket_path = socket_path
+        self.n_workers = n_workers
+        self.threads = threads
+        self.token_budget = token_budget
+        self.pools: Dict[str, InferencePool] = {}
+
+    def _pool(self, model: dict) -> InferencePool:
+        key = json.dumps(model, sort_keys=True)
+        if key not in self.pools:
+            self.pools[key] = InferencePool(
+                self.n_workers,
+                threads=self.threads,
+                token_budget=self.token_budget,
+                **model
+            )
+            print(f"🤖 Inference pool for {model['model_name']} ({model['backend']}): {self.n_workers} workers")
+        return self.pools[key]
+
+    def release(self, model: dict):
+        pool = self.pools.pop(json.dumps(model, sort_keys=True), None)
+        if pool is not None:
+            pool.close()
+            print(f"🗑️  Released inference pool: {model['model_name']}")
+
+    async def _respond(self, request: dict) -> Tuple[bytes, bytes]:
+        op = request['op']
+        vectors = np.empty((0, 0), dtype=np.float32)
+        try:
+            if op == 'release':
+                self.release(request['model'])
+            elif op == 'warm_up':
+                await self._pool(request['model']).warm_up()
+            elif op == 'encode':
+                vectors = await self._pool(request['model']).encode_array_async(request['texts'])
+            else:
+                raise ValueError(f"Unknown op: {op}")
+        except BrokenProcessPool:
+            # A worker died (e.g. the model failed to load): the next request starts a new pool
+            self.release(request['model'])
+            raise
+
+        header = json.dumps({'rows': vectors.shape[0], 'dim': vectors.shape[1] if vectors.ndim == 2 else 0})
+        return header.encode(), np.ascontiguousarray(vectors, dtype=np.float32).tobytes()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One client connection: requests are answered in order"""
+        try:
+            while True:
+                try:
+                    request = json.loads(await _read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    header, payload = await self._respond(request)
+                    writer.write(_frame(header) + _frame(payload))
+                except Exception as e:
+                    writer.write(_frame(json.dumps({'error': f"{type(e).__name__}: {e}"}).encode()))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, warm_models: Optional[List[dict]] = None):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # left behind by a previous run
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        # SIGTERM (like Ctrl+C) cancels serving, so the workers and socket are cleaned up
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        print(f"✅ Inference server listening on {self.socket_path} ({self.n_workers} workers per model)")
+
+        try:
+            for model in warm_models or []:
+                try:
+                    await self._pool(model).warm_up()
+                    print(f"✅ Warm: {model['model_name']}")
+                except Exception as e:
+                    # The first request retries; API workers stay unready until one succeeds
+                    self.release(model)
+                    print(f"⚠️  Warm-up of {model['model_name']} failed: {e}")
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for pool in self.pools.values():
+                pool.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+# ------ CLIENT ------
+
+class InferenceClient:
+    """
+    One model on the shared inference server; InferencePool's interface
+
+    Async requests reuse idle connections (one in flight per connection);
+    blocking calls open their own, so they work from any thread.
+    """
+
+    def __init__(self, socket_path: str, model: dict, n_workers: int):
+        self.socket_path = socket_path
+        self.model = model
+        self.n_workers = n_workers
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def _request(self, op: str, texts: Optional[List[str]] = None) -> np.ndarray:
+        body = json.dumps({'op': op, 'model': self.model, 'texts': texts or []}).encode()
+        if self._idle:
+            reader, writer = self._idle.pop()
+        else:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+
+        try:
+            writer.write(_frame(body))
+            await writer.drain()
+            header = await _read_frame(reader)
+            error = json.loads(header).get('error')
+            payload = None if error else await _read_frame(reader)
+        except BaseException:
+            # Half-read response (or cancelled): the connection cannot be reused
+            writer.close()
+            raise
+
+        self._idle.append((reader, writer))
+        if error:
+            raise RuntimeError(f"Inference server: {error}")
+        return _vectors(header, payload)
+
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Blocking encode (scripts and other synchronous callers)"""
+        if not texts:
+            return []
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall(_frame(json.dumps({'op': 'encode', 'model': self.model, 'texts': texts}).encode()))
+            header = _recv_frame(sock)
+            error = json.loads(header).get('error')
+            if error:
+                raise RuntimeError(f"Inference server: {error}")
+            return _vectors(header, _recv_frame(sock)).tolist()
+
+    async def encode_batch_async(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return (await self._request('encode', texts)).tolist()
+
+    async def warm_up(self):
+        """Start the server's workers for this model and run one encode on each"""
+        await self._request('warm_up')
+
+    async def release(self):
+        """Stop the server's workers for this model (after a cutover away from it)"""
+        await self._request('release')
+
+    def close(self):
+        """Close this process's connections; the server keeps running"""
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
@@ -0,0 +1,77 @@
+"""
+Length-Bucketed Encoding
+File: app/services/length_buckets.py
+
+A transformer batch is padded to its longest text, so a short title batched
+with a 256-token description costs 256 tokens. For bulk encoding, texts are
+sorted by token length and cut into buckets whose padded size (texts x
+longest) stays within a token budget: many short texts share a pass, long
+ones go in small batches. Results come back in the original order.
+
+Imported by inference workers, so it must not pull in the database or
+config modules.
+"""
+
+from typing import List
+
+import numpy as np
+
+MAX_BUCKET_SIZE = 512  # Texts per forward pass, however short
+
+def token_lengths(model, texts: List[str]) -> List[int]:
+    """Tokens per text after truncation (SentenceTransformer or OnnxEncoder)"""
+    if hasattr(model, 'token_lengths'):
+        return model.token_lengths(texts)
+    input_ids = model.tokenizer(texts, truncation=True, max_length=model.max_seq_length)['input_ids']
+    return [len(ids) for ids in input_ids]
+
+def token_budget_batches(
+    lengths: List[int],
+    token_budget: int,
+    max_batch_size: int = MAX_BUCKET_SIZE
+) -> List[np.ndarray]:
+    """Index batches in ascending length order, each padding to <= token_budget tokens"""
+    batches = []
+    current: List[int] = []
+
+    for i in np.argsort(lengths, kind='stable'):
+        # Sorted ascending, so the new text is the batch's longest
+        if current and ((len(current) + 1) * lengths[i] > token_budget or len(current) >= max_batch_size):
+            batches.append(np.array(current))
+            current = []
+        current.append(i)
+
+    if current:
+        batches.append(np.array(current))
+    return batches
+
+def encode_bucketed(
+    model,
+    texts: List[str],
+    token_budget: int,
+    max_batch_size: int = MAX_BUCKET_SIZE
+) -> np.ndarray:
+    """Normalized float32 embeddings in the order of `texts`"""
+    if len(texts) == 1:
+        # One text needs no bucketing: skip the extra tokenization pass
+        return np.asarray(
+            model.encode(texts, normalize_embeddings=True, convert_to_numpy=True, batch_size=1),
+            dtype=np.float32
+        )
+
+    embeddings = None
+
+    for batch in token_budget_batches(token_lengths(model, texts), token_budget, max_batch_size):
+        vectors = model.encode(
+            [texts[i] for i in batch],
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            batch_size=len(batch)  # the bucket is the batch
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        embeddings[batch] = vectors
+
+    if embeddings is None:
+        return np.empty((0, 0), dtype=np.float32)
+    return embeddings
@@ -0,0 +1,91 @@
+"""
+ONNX Runtime Encoder
+File: app/services/onnx_encoder.py
+
+MiniLM exported to ONNX (app/scripts/export_onnx_model.py) and run with
+ONNX Runtime on CPU, optionally with dynamic int8 quantized weights. Does
+the same as SentenceTransformer.encode for this model (tokenize, transformer,
+mean pooling, L2 normalization) without importing torch.
+
+Selected with EMBEDDING_BACKEND=onnx; ONNX_MODEL_DIR holds:
+    tokenizer.json      fast tokenizer (HF tokenizers)
+    model.onnx          float32 graph
+    model.int8.onnx     dynamic int8 quantization of model.onnx
+
+Imported by inference workers, so it must not pull in the database or
+config modules.
+"""
+
+import os
+from typing import List, Union
+
+import numpy as np
+
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 max_seq_length
+
+def onnx_model_path(model_dir: str, quantized: bool = True) -> str:
+    return os.path.join(model_dir, "model.int8.onnx" if quantized else "model.onnx")
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode on the exported graph"""
+
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        # Unpadded copy for measuring lengths (app/services/length_buckets.py)
+        self._counter = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._counter.enable_truncation(MAX_SEQ_LENGTH)
+        self._counter.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            onnx_model_path(model_dir, quantized),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        return [len(encoding.ids) for encoding in self._counter.encode_batch(texts)]
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        """Mean-pooled token embeddings of one batch"""
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        tokens = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+
+        weights = mask[:, :, None].astype(np.float32)
+        return (tokens * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+    def encode(
+        self,
+        texts: Union[str, List[str]],
+        normalize_embeddings: bool = True,
+        batch_size: int = 32,
+        **kwargs
+    ) -> np.ndarray:
+        """float32 embeddings; a single string gives one row (like SentenceTransformer)"""
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+
+        embeddings = np.zeros((len(texts), 384), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            embeddings[start:start + batch_size] = self._forward(texts[start:start + batch_size])
+
+        if normalize_embeddings:
+            embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,21 @@
+"""
+Worker Process Pools
+File: app/services/process_pool.py
+
+ProcessPoolExecutor factory for the inference pool and sharded search.
+
+Workers are spawned, not forked: forking a process that runs an event loop
+and threads is unsafe. A spawned worker imports the module of the function
+it runs, so those modules must not pull in the database or config modules.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def spawn_executor(max_workers: int, **kwargs) -> ProcessPoolExecutor:
+    """ProcessPoolExecutor with spawned workers (kwargs: initializer, initargs, ...)"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        **kwargs
+    )
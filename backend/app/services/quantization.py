@@ -0,0 +1,249 @@
+"""
+Embedding Quantization
+File: app/services/quantization.py
+
+Compact encodings of the catalog embeddings for the first-pass scan of
+semantic search. Only a shortlist is re-scored with full-precision vectors.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+def widened_scores(matrix: np.ndarray, queries: np.ndarray, chunk_size: int = 2048) -> np.ndarray:
+    """
+    queries @ matrix.T for a narrow-typed matrix (int8 codes, float16 rows)
+
+    queries is (dim,) or (n_queries, dim). NumPy has no int8/float16 GEMM,
+    and `queries @ matrix.T` would widen the whole matrix at once, so rows
+    are widened one chunk at a time. Chunks small enough to stay in cache
+    keep the scan bandwidth-bound on the narrow type.
+    """
+    queries = queries.astype(np.float32)
+    scores = np.empty(queries.shape[:-1] + (len(matrix),), dtype=np.float32)
+    for start in range(0, len(matrix), chunk_size):
+        chunk = matrix[start:start + chunk_size].astype(np.float32)
+        scores[..., start:start + chunk_size] = queries @ chunk.T
+    return scores
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 quantization
+
+    Each dimension d is mapped linearly onto [-128, 127]:
+        x[d] ~= offset[d] + scale[d] * code[d]
+    so a 384-dim float32 vector (1536 bytes) becomes 384 bytes.
+    """
+
+    def __init__(self, scale: np.ndarray, offset: np.ndarray):
+        self.scale = scale.astype(np.float32)
+        self.offset = offset.astype(np.float32)
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        """Derive scale/offset from the per-dimension min and max"""
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        scale = (high - low) / 255.0
+        scale[scale == 0] = 1.0  # constant dimension, any scale works
+        return cls(scale=scale, offset=low + 128.0 * scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.offset + self.scale * codes.astype(np.float32)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray, chunk_size: int = 2048) -> np.ndarray:
+        """
+        Approximate inner products between queries and every encoded row
+
+        q . x ~= q . offset + (q * scale) . code
+
+        queries is (dim,) or (n_queries, dim); the result is (n,) or
+        (n_queries, n). The int8 scan moves 4x less memory than float32.
+        """
+        weights = queries * self.scale
+        bias = np.asarray(queries @ self.offset, dtype=np.float32)
+        return widened_scores(codes, weights, chunk_size) + bias[..., None]
+
+class BinaryQuantizer:
+    """
+    Sign-bit quantization with Hamming-distance scoring
+
+    Each dimension keeps one bit, set when x[d] > threshold[d], so a
+    384-dim vector becomes 48 bytes (32x smaller than float32). Thresholds
+    are the per-dimension means: MiniLM dimensions are not zero-centred,
+    and centring spreads the bits.
+
+    Hamming distance h between two codes estimates the angle between the
+    centred vectors (angle ~= pi * h / dim), which is enough to shortlist
+    candidates for an exact rerank.
+    """
+
+    def __init__(self, threshold: np.ndarray):
+        self.threshold = threshold.astype(np.float32)
+        self.dim = len(threshold)
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> "BinaryQuantizer":
+        return cls(threshold=vectors.mean(axis=0))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > self.threshold, axis=-1)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Unit-length +-1 vectors (only the signs survive quantization)"""
+        signs = np.unpackbits(codes, axis=-1, count=self.dim).astype(np.float32) * 2 - 1
+        return signs / np.sqrt(self.dim)
+
+    def hamming(self, codes: np.ndarray, queries: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+        """
+        Hamming distance between each query and every encoded row
+
+        Codes are read as uint64 words (6 per 384-bit row): per row that is
+        6 XORs and 6 popcounts. Words are accumulated column by column
+        inside cache-sized chunks, which is ~3x faster than popcounting the
+        (rows, 6) block and summing along the short axis.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        query_words = self.encode(np.atleast_2d(queries)).view(np.uint64)
+        words = np.ascontiguousarray(codes).view(np.uint64)
+
+        distances = np.empty((len(query_words), len(words)), dtype=np.uint16)
+        for start in range(0, len(words), chunk_size):
+            chunk = words[start:start + chunk_size]
+            for i, query_row in enumerate(query_words):
+                out = distances[i, start:start + chunk_size]
+                out[:] = np.bitwise_count(chunk[:, 0] ^ query_row[0])
+                for j in range(1, words.shape[1]):
+                    out += np.bitwise_count(chunk[:, j] ^ query_row[j])
+        return distances if queries.ndim == 2 else distances[0]
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Approximate similarity: 1 at Hamming 0, -1 when every bit differs"""
+        return 1.0 - 2.0 * self.hamming(codes, queries).astype(np.float32) / self.dim
+
+class PCAProjection:
+    """
+    Principal-component projection to `n_components` dimensions
+
+    x ~= mean + components.T @ z, so for a query q:
+        q . x ~= q . mean + (components @ q) . z
+    A 128-dim z makes the first-pass scan 3x cheaper than 384 dims
+    (6x at 64). The projection is fitted once per model_version by
+    app/scripts/fit_pca_projection.py and published under a version name.
+    """
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        components: np.ndarray,
+        model_version: Optional[str] = None,
+        version: Optional[str] = None,
+        explained_variance: float = 0.0
+    ):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (n_components, dim), orthonormal rows
+        self.model_version = model_version
+        self.version = version
+        self.explained_variance = explained_variance
+
+    @property
+    def n_components(self) -> int:
+        return len(self.components)
+
+    @classmethod
+    def fit(
+        cls,
+        vectors: np.ndarray,
+        n_components: int = 128,
+        max_train: int = 50000,
+        model_version: Optional[str] = None,
+        version: Optional[str] = None
+    ) -> "PCAProjection":
+        """Top eigenvectors of the (sampled) covariance matrix"""
+        rng = np.random.default_rng(0)
+        sample = np.asarray(vectors[np.sort(rng.permutation(len(vectors))[:max_train])], dtype=np.float64)
+
+        mean = sample.mean(axis=0)
+        centered = sample - mean
+        covariance = centered.T @ centered / max(len(sample) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)  # ascending
+
+        top = np.argsort(eigenvalues)[::-1][:n_components]
+        explained = float(eigenvalues[top].sum() / max(eigenvalues.sum(), 1e-12))
+        return cls(mean, eigenvectors[:, top].T, model_version, version, explained)
+
+    def encode(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Reduced vectors (chunked: no full-size float32 temporary)"""
+        codes = np.empty((len(vectors), self.n_components), dtype=np.float32)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size].astype(np.float32) - self.mean
+            codes[start:start + chunk_size] = chunk @ self.components.T
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.mean + codes @ self.components
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Approximate inner products, one reduced-dimension GEMM"""
+        queries = np.asarray(queries, dtype=np.float32)
+        bias = np.asarray(queries @ self.mean, dtype=np.float32)
+        return (queries @ self.components.T) @ codes.T + bias[..., None]
+
+    # ------ PERSISTENCE ------
+    # <projection_dir>/<model_version>/CURRENT -> version name
+    # <projection_dir>/<model_version>/<version>.npz
+
+    def save(self, projection_dir: str):
+        """Write this projection and make it the current one for its model"""
+        model_dir = os.path.join(projection_dir, self.model_version)
+        os.makedirs(model_dir, exist_ok=True)
+
+        tmp_path = os.path.join(model_dir, f"{self.version}.tmp.npz")
+        np.savez(
+            tmp_path,
+            mean=self.mean,
+            components=self.components,
+            explained_variance=self.explained_variance
+        )
+        os.replace(tmp_path, os.path.join(model_dir, f"{self.version}.npz"))
+
+        pointer_tmp = os.path.join(model_dir, "CURRENT.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(self.version)
+        os.replace(pointer_tmp, os.path.join(model_dir, "CURRENT"))
+
+    @staticmethod
+    def current_version(projection_dir: str, model_version: str) -> Optional[str]:
+        try:
+            with open(os.path.join(projection_dir, model_version, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load_current(cls, projection_dir: str, model_version: str) -> Optional["PCAProjection"]:
+        """The published projection for `model_version`, or None"""
+        version = cls.current_version(projection_dir, model_version)
+        if version is None:
+            return None
+
+        with np.load(os.path.join(projection_dir, model_version, f"{version}.npz")) as data:
+            return cls(
+                data['mean'],
+                data['components'],
+                model_version=model_version,
+                version=version,
+                explained_variance=float(data['explained_variance'])
+            )
+
+# VECTOR_QUANTIZATION value -> quantizer class
+QUANTIZERS = {
+    'int8': ScalarQuantizer,
+    'binary': BinaryQuantizer,
+    'pca': PCAProjection,
+}
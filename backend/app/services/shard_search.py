@@ -0,0 +1,259 @@
+"""
+Sharded Vector Search
+File: app/services/shard_search.py
+
+Scatter-gather top-k over local worker processes, so one query block uses
+every core instead of one. The embedding matrix is split into contiguous
+row shards; each worker memory-maps the same .npy file (the published
+snapshot, or a copy on tmpfs) and scores only its shard. The front process
+merges the per-shard top-k lists.
+
+Live patches do not rewrite the matrix: rows replaced or appended since
+it was published go into a small delta file that the workers score on top
+of it. Only a delta past MAX_DELTA_ROWS rewrites the base. So with a
+snapshot every API worker keeps mapping the one published file, and a
+NOTIFY patch costs I/O proportional to the patched rows.
+
+Only file paths, query blocks and packed filter masks cross the process
+boundary; the matrix itself is shared through the page cache.
+
+Workers run in spawned processes (app/services/process_pool.py).
+"""
+
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.process_pool import spawn_executor
+from app.services.quantization import widened_scores
+
+# Patched rows kept in the delta before the base is rewritten (~12 MB at 384 float32 dims)
+MAX_DELTA_ROWS = 8192
+
+# ------ WORKER SIDE ------
+
+_mapped: Dict[str, np.ndarray] = {}
+_deltas: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+def _open_matrix(path: str) -> np.ndarray:
+    """Map `path` once per worker; older publications are dropped"""
+    matrix = _mapped.get(path)
+    if matrix is None:
+        _mapped.clear()
+        matrix = _mapped[path] = np.load(path, mmap_mode='r')
+    return matrix
+
+def _open_delta(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(row positions, vectors) of a delta file, read once per worker"""
+    delta = _deltas.get(path)
+    if delta is None:
+        _deltas.clear()
+        with np.load(path) as data:
+            delta = _deltas[path] = (data['positions'], data['vectors'])
+    return delta
+
+def _scores(matrix: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    if matrix.dtype == np.float32:
+        return queries @ matrix.T
+    return widened_scores(matrix, queries)  # float16 (halfvec models)
+
+def search_shard(
+    path: str,
+    delta_path: Optional[str],
+    start: int,
+    end: int,
+    stop: int,
+    queries: np.ndarray,
+    k: int,
+    masks: List[Optional[np.ndarray]]
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Top-k (global row positions, scores) within rows [start, stop) per query
+
+    Rows [start, end) are read from the base matrix; rows in the delta file
+    override them, and rows [end, stop) (appended since the base was
+    published, last shard only) exist only there.
+    masks[i] is query i's packed filter bitset for this shard (None = all rows).
+    """
+    scores = np.full((len(queries), stop - start), -np.inf, dtype=np.float32)
+    scores[:, :end - start] = _scores(_open_matrix(path)[start:end], queries)
+    if delta_path:
+        positions, vectors = _open_delta(delta_path)
+        inside = (positions >= start) & (positions < stop)
+        if inside.any():
+            scores[:, positions[inside] - start] = _scores(vectors[inside], queries)
+    hits = []
+
+    for i, row_scores in enumerate(scores):
+        positions = np.arange(start, stop)
+        if masks[i] is not None:
+            keep = np.unpackbits(masks[i], count=stop - start).view(bool)
+            positions, row_scores = positions[keep], row_scores[keep]
+
+        top_k = min(k, len(row_scores))
+        if top_k == 0:
+            hits.append((positions[:0], row_scores[:0]))
+            continue
+
+        top = np.argpartition(-row_scores, top_k - 1)[:top_k]
+        hits.append((positions[top], row_scores[top]))
+
+    return hits
+
+# ------ FRONT SIDE ------
+
+class ShardedSearchPool:
+    """
+    `n_shards` worker processes scanning row ranges of a shared matrix
+
+    publish() makes a matrix visible to the workers and publish_rows()
+    patches rows of it; search() fans a query block out and merges the
+    partial top-k lists.
+    """
+
+    def __init__(self, n_shards: int, work_dir: Optional[str] = None, max_delta_rows: int = MAX_DELTA_ROWS):
+        self.n_shards = n_shards
+        # tmpfs keeps the private copy in RAM (and shared across processes)
+        self.work_dir = work_dir or ('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+        self.max_delta_rows = max_delta_rows
+        self.path: Optional[str] = None
+        self.delta_path: Optional[str] = None
+        # Rows in the base file, and in total with the appended delta rows
+        self.base_rows = 0
+        self.rows = 0
+        self._delta_positions = np.empty(0, dtype=np.int64)
+        self._owned: Dict[str, List[str]] = {'base': [], 'delta': []}
+        self._generation = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def publish(self, matrix: np.ndarray):
+        """
+        Share `matrix` with the workers
+
+        A full memory-mapped .npy (the embedding snapshot) is shared as is;
+        anything else is written to a private file first.
+        """
+        if self._is_whole_npy(matrix):
+            path = matrix.filename
+        else:
+            path = self._write('base', 'npy', lambda f: np.save(f, np.ascontiguousarray(matrix)))
+
+        self.path = path
+        self.delta_path = None
+        self._delta_positions = np.empty(0, dtype=np.int64)
+        self.base_rows = self.rows = len(matrix)
+
+    def publish_rows(self, matrix: np.ndarray, positions: np.ndarray) -> bool:
+        """
+        Share rows `positions` of `matrix` (replaced, or appended past the
+        base) without rewriting the base
+
+        The delta holds every row patched since publish(); False when it
+        would outgrow max_delta_rows, so the caller publishes in full.
+        """
+        positions = np.union1d(self._delta_positions, positions)
+        if len(positions) > self.max_delta_rows:
+            return False
+
+        vectors = np.ascontiguousarray(matrix[positions])
+        self.delta_path = self._write('delta', 'npz', lambda f: np.savez(f, positions=positions, vectors=vectors))
+        self._delta_positions = positions
+        self.rows = len(matrix)
+        return True
+
+    def _write(self, kind: str, ext: str, save: Callable) -> str:
+        """A new private file written atomically by `save`"""
+        self._generation += 1
+        path = os.path.join(self.work_dir, f"vector-shards-{os.getpid()}-{self._generation}.{ext}")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            save(f)
+        os.replace(tmp_path, path)
+
+        # Keep the previous file: queued tasks may still reference it
+        owned = self._owned[kind]
+        owned.append(path)
+        while len(owned) > 2:
+            os.remove(owned.pop(0))
+        return path
+
+    @staticmethod
+    def _is_whole_npy(matrix: np.ndarray) -> bool:
+        """True for an unsliced np.load(mmap_mode='r') array"""
+        if not isinstance(matrix, np.memmap) or not matrix.filename:
+            return False
+        try:
+            return np.load(matrix.filename, mmap_mode='r').shape == matrix.shape
+        except (OSError, ValueError):
+            return False
+
+    def shard_bounds(self) -> List[Tuple[int, int, int]]:
+        """
+        (start, end, stop) per shard over the base rows, multiples of 8 so
+        packed masks slice on byte boundaries; the last shard also covers
+        the appended rows up to `stop`
+        """
+        if not self.base_rows:
+            return [(0, 0, self.rows)] if self.rows else []
+        shard_rows = -(-self.base_rows // (self.n_shards * 8)) * 8
+        starts = list(range(0, self.base_rows, shard_rows))
+        return [
+            (start, min(start + shard_rows, self.base_rows), self.rows if start == starts[-1] else start + shard_rows)
+            for start in starts
+        ]
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = spawn_executor(self.n_shards)
+        return self._executor
+
+    async def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        masks: List[Optional[np.ndarray]]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k (row positions, scores) per query, unsorted
+
+        masks[i] is an optional boolean row mask for query i.
+        """
+        packed = [None if mask is None else np.packbits(mask) for mask in masks]
+        loop = asyncio.get_running_loop()
+
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(
+                self._pool(),
+                search_shard,
+                self.path,
+                self.delta_path,
+                start,
+                end,
+                stop,
+                queries,
+                k,
+                [None if bits is None else bits[start // 8:(stop + 7) // 8] for bits in packed]
+            )
+            for start, end, stop in self.shard_bounds()
+        ])
+
+        merged = []
+        for i in range(len(queries)):
+            positions = np.concatenate([part[i][0] for part in parts])
+            scores = np.concatenate([part[i][1] for part in parts])
+            merged.append((positions, scores))
+        return merged
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        for owned in self._owned.values():
+            for path in owned:
+                if os.path.exists(path):
+                    os.remove(path)
+            owned.clear()
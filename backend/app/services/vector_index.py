@@ -0,0 +1,843 @@
+"""
+In-Memory Project Vector Index
+File: app/services/vector_index.py
+
+Keeps every project embedding resident in one contiguous float32 matrix with
+parallel id/metadata arrays, so a semantic query is a single matrix-vector
+product plus an argpartition top-k instead of a full-table fetch per request.
+The matrix is float16 when the active model_version is stored as halfvec
+(app/services/embedding_storage.py).
+
+With VECTOR_QUANTIZATION=int8 only int8 codes stay resident (4x smaller);
+the shortlist from the int8 scan is re-scored with float vectors from Postgres.
+VECTOR_QUANTIZATION=binary keeps 48-byte sign-bit codes (32x smaller) and
+shortlists by Hamming distance the same way. VECTOR_QUANTIZATION=pca scans
+PCA-reduced vectors (the projection published for the active model_version
+under PCA_PROJECTION_DIR, or fitted at load when none is published).
+
+With EMBEDDING_SNAPSHOT_DIR set, the matrix is a read-only np.memmap of the
+published snapshot (app/services/embedding_snapshot.py), shared by every
+worker through the page cache; only project metadata is read from Postgres.
+
+With VECTOR_INDEX_SHARDS > 1 the float scan is split across worker
+processes (app/services/shard_search.py) and the partial top-k lists merged.
+The workers map the loaded matrix, which every API worker shares when it
+is the snapshot; patches reach them as a delta of the changed rows.
+
+Between reloads, changed projects are patched in (apply_changes) by the
+LISTEN/NOTIFY listener in app/services/embedding_listener.py.
+
+The index holds one model_version (model_version attribute): the active one
+when it was loaded. A cutover to another version makes it stale.
+
+Only the first load blocks a search. A stale index is rebuilt in a
+background task (database reads awaited, array building in a thread) and
+swapped in when complete; searches keep using the previous arrays meanwhile.
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import config
+from app.database.sql_engine import get_db
+from app.database.tables import projects, project_embeddings
+from app.services.ann_index import IVFPQIndex
+from app.services.quantization import QUANTIZERS, BinaryQuantizer, PCAProjection, ScalarQuantizer, widened_scores
+from app.services.embedding_storage import STORED_COLUMNS, has_embedding, resident_dtype, row_vector
+from app.services.embedding_snapshot import current_snapshot_version, open_snapshot
+from app.services.embedding_versions import active_model
+from app.services.bitmap_index import BitmapIndex, pack, unpack
+from app.services.shard_search import ShardedSearchPool
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+
+# Filterable fields -> bitmap index; topics is multi-valued
+FILTER_FIELDS = ('difficulty', 'source', 'language', 'topics')
+
+# Seconds before a failed background reload is retried
+RELOAD_RETRY_SECONDS = 5.0
+
+# Queries scored per GEMM in batch search; bounds the (queries x catalog) score block
+QUERY_BLOCK_SIZE = 64
+
+# Project columns returned with every search hit
+PROJECT_FIELDS = (
+    'id', 'title', 'description', 'repo_url', 'difficulty', 'topics',
+    'estimated_hours', 'source', 'stars', 'language'
+)
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows stay zero)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_indices(scores: np.ndarray, k: int, sort: bool = True) -> np.ndarray:
+    """Indices of the k highest scores (argpartition is O(n))"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    if sort:
+        # Only the k winners get fully sorted
+        top = top[np.argsort(-scores[top])]
+    return top
+
+class ProjectVectorIndex:
+    """
+    Process-resident embedding index
+
+    Row i of `embeddings` (or `codes` when quantized) belongs to project
+    `ids[i]` and is described by `metadata[i]`. `bitmaps` holds one
+    BitmapIndex per FILTER_FIELDS entry over the same rows.
+    The whole catalog is reloaded after `invalidate()` is called, and when
+    the TTL expires while no listener keeps it current (`live_updates`).
+
+    Rows whose project no longer exists (possible with snapshots, or
+    tombstoned by apply_changes) are masked out through `alive`. Rows
+    never move: patches replace in place or append at the end, so ids
+    are only ascending until the first out-of-order append.
+
+    An optional IVF-PQ index (`ann`) gives sublinear candidate generation;
+    it is persisted next to `ann_path`, one file per model version
+    (ann_file), and patched (add/delete) on reload instead of being
+    rebuilt. A cutover to another model version starts a new one.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        ann_path: Optional[str] = None,
+        quantization: str = "none",
+        rerank_candidates: int = 200,
+        snapshot_dir: Optional[str] = None,
+        n_shards: int = 0,
+        projection_dir: Optional[str] = None,
+        pca_components: int = 128
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.ann_path = ann_path
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_version: Optional[str] = None
+        self.model_version: Optional[str] = None
+        self.quantization = quantization
+        self.rerank_candidates = rerank_candidates
+        self.projection_dir = projection_dir
+        self.pca_components = pca_components
+        self.ids = np.empty(0, dtype=np.int64)
+        self.embeddings: Optional[np.ndarray] = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.codes: Optional[np.ndarray] = None
+        self.quantizer: Optional[Union[ScalarQuantizer, BinaryQuantizer, PCAProjection]] = None
+        self.bitmaps = {field: BitmapIndex.build([]) for field in FILTER_FIELDS}
+        self.metadata: List[Optional[dict]] = []
+        self.alive = np.empty(0, dtype=bool)
+        self.ann: Optional[IVFPQIndex] = None
+        # id lookup: ids[_sorted_positions] == _sorted_ids (None = ids already sorted)
+        self._sorted_ids = self.ids
+        self._sorted_positions: Optional[np.ndarray] = None
+        # Over-allocated private copies backing the arrays after patches
+        self._buffers: Dict[str, np.ndarray] = {}
+        # Bumped on every load; shards republish in full when they lag behind
+        self._version = 0
+        self.shards = ShardedSearchPool(n_shards) if n_shards > 1 else None
+        self._shards_version: Optional[int] = None
+        # Matrix as loaded (a snapshot memmap is shared by every API worker) and rows patched since
+        self._shards_base: Optional[np.ndarray] = None
+        self._unpublished_rows: set = set()
+        self._loaded_at: Optional[float] = None
+        self._ann_synced_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_failed_at: Optional[float] = None
+        # Ids patched while a background reload runs, replayed onto the new arrays
+        self._changed_during_reload: Optional[set] = None
+        # Set by the NOTIFY listener: True while it is patching this index
+        self.live_updates: Callable[[], bool] = lambda: False
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        # Cutover to another model version
+        if self.model_version != active_model.version:
+            return True
+        # A newly published snapshot is picked up on the next request
+        if self.snapshot_dir and current_snapshot_version(self.snapshot_dir) != self.snapshot_version:
+            return True
+        # Same for a newly fitted PCA projection
+        if self.quantization == "pca" and self.projection_dir:
+            published = PCAProjection.current_version(self.projection_dir, self.model_version)
+            if published != getattr(self.quantizer, 'version', None):
+                return True
+        # Patched as changes commit; the TTL is only the fallback when the listener is down
+        if self.live_updates():
+            return False
+        return (time.monotonic() - self._loaded_at) > self.ttl_seconds
+
+    def invalidate(self):
+        """Force a reload on the next search"""
+        self._loaded_at = None
+
+    async def load(self, db: AsyncSession):
+        """Fetch every project with an embedding into contiguous arrays"""
+        self._swap(await self._build(db))
+
+    async def _build(self, db: AsyncSession) -> dict:
+        """Arrays for the active model version; the resident index is untouched"""
+        started = time.perf_counter()
+        model_version = active_model.version
+        published = current_snapshot_version(self.snapshot_dir) if self.snapshot_dir else None
+
+        version = published
+        loaded = await self._load_snapshot(db, version, model_version) if version else None
+        if loaded is None:
+            # No snapshot, or it holds another model version (not exported since the cutover)
+            version = None
+            loaded = await self._load_database(db, model_version=model_version)
+        ids, embeddings, metadata = loaded
+
+        # Quantizer fit and bitmaps are CPU-bound: keep them off the event loop
+        state = await asyncio.to_thread(self._index_arrays, ids, embeddings, metadata, version, model_version)
+        state.update(snapshot_version=published, model_version=model_version, source=version, started=started)
+        return state
+
+    def _index_arrays(self, ids, embeddings, metadata, version: Optional[str], model_version: str) -> dict:
+        codes, quantizer = None, None
+        if self.quantization in QUANTIZERS:
+            quantizer = self._fit_quantizer(embeddings, model_version)
+            codes = quantizer.encode(embeddings)
+            if not version:
+                embeddings = None  # reranking fetches full vectors from Postgres
+
+        return {
+            'embeddings': embeddings,
+            'codes': codes,
+            'quantizer': quantizer,
+            'ids': ids,
+            'alive': np.array([m is not None for m in metadata], dtype=bool),
+            'bitmaps': self._build_bitmaps(metadata),
+            'metadata': metadata
+        }
+
+    def _swap(self, state: dict):
+        # Swap everything at once (no awaits) so concurrent searches never see a mix
+        if state['model_version'] != self.model_version:
+            # The ANN codebooks and codes were trained on the previous model's vectors
+            self.ann = None
+            self._ann_synced_at = None
+        self.embeddings = state['embeddings']
+        self.codes = state['codes']
+        self.quantizer = state['quantizer']
+        self.ids = state['ids']
+        self._sorted_ids = state['ids']
+        self._sorted_positions = None
+        self._buffers = {}
+        self.alive = state['alive']
+        self.bitmaps = state['bitmaps']
+        self.metadata = state['metadata']
+        self.snapshot_version = state['snapshot_version']
+        self.model_version = state['model_version']
+        self._version += 1
+        self._shards_base = self.embeddings if self.shards is not None else None
+        self._unpublished_rows = set()
+        self._loaded_at = time.monotonic()
+
+        elapsed_ms = (time.perf_counter() - state['started']) * 1000
+        source = f"snapshot {state['source']}" if state['source'] else "database"
+        print(f"✅ Loaded vector index ({self.model_version}) from {source}: {self.size} projects in {elapsed_ms:.0f}ms")
+
+    def _fit_quantizer(self, embeddings: np.ndarray, model_version: str):
+        """Coarse-stage encoder; a published PCA projection is reused, not refitted"""
+        if self.quantization == "pca":
+            projection = None
+            if self.projection_dir:
+                projection = PCAProjection.load_current(self.projection_dir, model_version)
+            return projection or PCAProjection.fit(embeddings, n_components=self.pca_components)
+        return QUANTIZERS[self.quantization].fit(embeddings)
+
+    async def _load_database(
+        self,
+        db: AsyncSession,
+        project_ids: Optional[List[int]] = None,
+        model_version: Optional[str] = None
+    ):
+        """Embeddings of one model version and metadata in one query (private copy)"""
+        model_version = model_version or self.model_version
+        stmt = (
+            select(
+                *[projects.c[name] for name in PROJECT_FIELDS],
+                *STORED_COLUMNS
+            )
+            .select_from(projects)
+            .join(project_embeddings, projects.c.id == project_embeddings.c.project_id)
+            .where(has_embedding(model_version))
+            .order_by(projects.c.id)
+        )
+        if project_ids is not None:
+            stmt = stmt.where(projects.c.id.in_(project_ids))
+
+        result = await db.execute(stmt)
+        rows = result.fetchall()
+        # The per-row decoding is pure Python: run it in a thread
+        return await asyncio.to_thread(self._database_arrays, rows, model_version)
+
+    @staticmethod
+    def _database_arrays(rows, model_version: str):
+        embeddings = np.empty((len(rows), EMBEDDING_DIM), dtype=np.float32)
+        metadata = []
+        for i, row in enumerate(rows):
+            embeddings[i] = row_vector(row)
+            metadata.append({name: getattr(row, name) for name in PROJECT_FIELDS})
+
+        ids = np.array([m['id'] for m in metadata], dtype=np.int64)
+        # float16 when the model is stored as halfvec (half the RAM)
+        return ids, normalize_rows(embeddings).astype(resident_dtype(model_version), copy=False), metadata
+
+    async def _load_snapshot(self, db: AsyncSession, version: str, model_version: str):
+        """Memory-mapped embeddings + metadata for the snapshot's ids (None if another model's)"""
+        header, ids, embeddings = open_snapshot(self.snapshot_dir, version)
+        if header.get('model_version', model_version) != model_version:
+            return None
+
+        result = await db.execute(
+            select(*[projects.c[name] for name in PROJECT_FIELDS])
+        )
+        rows = result.fetchall()
+
+        def snapshot_metadata():
+            by_id = {row.id: {name: getattr(row, name) for name in PROJECT_FIELDS} for row in rows}
+            # Projects deleted after the export get None and are never returned
+            return [by_id.get(project_id) for project_id in ids.tolist()]
+
+        return ids, embeddings, await asyncio.to_thread(snapshot_metadata)
+
+    @staticmethod
+    def _filter_values(project: Optional[dict], field: str) -> Optional[List[str]]:
+        """Bitmap values of one project for one filter field"""
+        if project is None or not project[field]:
+            return None
+        return project[field] if field == 'topics' else [project[field]]
+
+    @classmethod
+    def _build_bitmaps(cls, metadata: List[Optional[dict]]) -> dict:
+        return {
+            field: BitmapIndex.build([cls._filter_values(m, field) for m in metadata])
+            for field in FILTER_FIELDS
+        }
+
+    async def ensure_loaded(self, db: AsyncSession):
+        """Load the index on first use; start a background rebuild when it is stale"""
+        if not self.is_stale():
+            return
+
+        if self.model_version is None:
+            # Nothing to serve yet, so this search waits
+            async with self._lock:
+                # Another request may have loaded while we waited
+                if self.model_version is None:
+                    await self.load(db)
+            return
+
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+        if self._reload_failed_at is not None and time.monotonic() - self._reload_failed_at < RELOAD_RETRY_SECONDS:
+            return
+        self._reload_task = asyncio.create_task(self._reload())
+
+    async def _reload(self):
+        """Rebuild with its own session, swap, then replay patches that arrived meanwhile"""
+        self._changed_during_reload = set()
+        try:
+            async with get_db() as db:
+                state = await self._build(db)
+        except Exception as e:
+            self._changed_during_reload = None
+            self._reload_failed_at = time.monotonic()
+            print(f"⚠️  Vector index reload failed, serving the previous one: {e}")
+            return
+
+        async with self._lock:
+            self._swap(state)
+            changed, self._changed_during_reload = self._changed_during_reload, None
+        self._reload_failed_at = None
+
+        if changed:
+            async with get_db() as db:
+                await self.apply_changes(db, sorted(changed))
+
+    def filter_mask(
+        self,
+        difficulty_filter: Optional[str] = None,
+        source_filter: Optional[List[str]] = None,
+        language_filter: Optional[List[str]] = None,
+        topics_filter: Optional[List[str]] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Boolean mask of rows passing the filters (None = no filtering)
+
+        Values within a filter are ORed (a project matches if it has any
+        of the topics), filters are ANDed. Everything runs on packed
+        bitsets, so any combination costs a few vectorized passes over
+        size/8 bytes.
+        """
+        wanted = {
+            'difficulty': [difficulty_filter] if difficulty_filter else None,
+            'source': source_filter,
+            'language': language_filter,
+            'topics': topics_filter,
+        }
+
+        bits = None if self.alive.all() else pack(self.alive)
+        for field, values in wanted.items():
+            if not values:
+                continue
+            field_bits = self.bitmaps[field].any_of(values)
+            bits = field_bits if bits is None else np.bitwise_and(bits, field_bits)
+
+        return None if bits is None else unpack(bits, self.size)
+
+    def _top_k(self, positions: np.ndarray, scores: np.ndarray, limit: int) -> List[dict]:
+        """Sort the best `limit` (position, score) pairs into result dicts"""
+        # A row tombstoned while a rerank was awaiting the DB is dropped
+        return [
+            {**self.metadata[positions[i]], 'semantic_similarity': float(scores[i])}
+            for i in top_k_indices(scores, limit)
+            if self.metadata[positions[i]] is not None
+        ]
+
+    @staticmethod
+    def _unit_query(query_embedding: List[float]) -> Optional[np.ndarray]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        return None if query_norm == 0 else query / query_norm
+
+    @property
+    def is_quantized(self) -> bool:
+        return self.codes is not None
+
+    def coarse_scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Similarity of each query to every row (approximate when quantized)
+
+        queries is (dim,) or (n_queries, dim); the result is (size,) or
+        (n_queries, size). Rows are unit length, so one GEMM gives every
+        cosine similarity.
+        """
+        if self.is_quantized:
+            return self.quantizer.scores(self.codes, queries)
+        if self.embeddings.dtype != np.float32:
+            return widened_scores(self.embeddings, queries)
+        return queries @ self.embeddings.T
+
+    def vectors(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Resident vectors for the given rows (dequantized when quantized)"""
+        if positions is None:
+            positions = slice(None)
+        if self.embeddings is not None:
+            return self.embeddings[positions]
+        return self.quantizer.decode(self.codes[positions])
+
+    async def full_vectors(self, db: AsyncSession, positions: np.ndarray) -> np.ndarray:
+        """Full-precision unit vectors for a shortlist of rows"""
+        if self.embeddings is not None:
+            return self.embeddings[positions]
+
+        ids = self.ids[positions].tolist()
+        result = await db.execute(
+            select(project_embeddings.c.project_id, *STORED_COLUMNS)
+            .where(project_embeddings.c.project_id.in_(ids))
+            .where(project_embeddings.c.model_version == self.model_version)
+        )
+        by_id = {row.project_id: row_vector(row) for row in result}
+
+        # Rows deleted since the last load stay zero (= similarity 0)
+        vectors = np.zeros((len(ids), EMBEDDING_DIM), dtype=np.float32)
+        for i, project_id in enumerate(ids):
+            if by_id.get(project_id) is not None:
+                vectors[i] = by_id[project_id]
+        return normalize_rows(vectors)
+
+    async def rerank(
+        self,
+        db: AsyncSession,
+        query: np.ndarray,
+        positions: np.ndarray,
+        limit: int
+    ) -> List[dict]:
+        """Exact cosine similarity for a candidate set, best `limit` returned"""
+        scores = (await self.full_vectors(db, positions)) @ query
+        return self._top_k(positions, scores, limit)
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query_embedding: List[float],
+        limit: int = 20,
+        difficulty_filter: Optional[str] = None,
+        source_filter: Optional[List[str]] = None,
+        language_filter: Optional[List[str]] = None,
+        topics_filter: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Top-k projects by cosine similarity to the query embedding"""
+        results = await self.search_batch(
+            db,
+            [query_embedding],
+            limit=limit,
+            filters=[{
+                'difficulty_filter': difficulty_filter,
+                'source_filter': source_filter,
+                'language_filter': language_filter,
+                'topics_filter': topics_filter
+            }]
+        )
+        return results[0]
+
+    async def search_batch(
+        self,
+        db: AsyncSession,
+        query_embeddings,
+        limit: int = 20,
+        filters: Optional[List[dict]] = None
+    ) -> List[List[dict]]:
+        """
+        Top-k projects for each row of a query matrix
+
+        Queries are scored QUERY_BLOCK_SIZE at a time with a single GEMM;
+        `filters[i]` holds the filter_mask() keyword arguments for query i.
+        When quantized, the shortlists of a block are re-scored with one
+        shared fetch of full-precision vectors.
+        """
+
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        results: List[List[dict]] = [[] for _ in range(len(queries))]
+        if self.size == 0 or limit <= 0:
+            return results
+
+        valid = np.linalg.norm(queries, axis=1) > 0
+        queries = normalize_rows(queries)
+
+        if self.shards is not None and not self.is_quantized:
+            await self.ensure_shards()
+            return await self._search_sharded(queries, valid, limit, filters, results)
+
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            block = queries[start:start + QUERY_BLOCK_SIZE]
+            block_scores = self.coarse_scores(block)
+            shortlists = []
+
+            for offset, scores in enumerate(block_scores):
+                i = start + offset
+                if not valid[i]:
+                    continue
+
+                positions = np.arange(self.size)
+                mask = self.filter_mask(**(filters[i] if filters else {}))
+                if mask is not None:
+                    positions, scores = positions[mask], scores[mask]
+
+                if self.is_quantized:
+                    # Coarse scan picks the shortlist, float vectors decide the order
+                    shortlist = top_k_indices(scores, max(limit, self.rerank_candidates), sort=False)
+                    shortlists.append((i, positions[shortlist]))
+                else:
+                    results[i] = self._top_k(positions, scores, limit)
+
+            if shortlists:
+                union = np.unique(np.concatenate([positions for _, positions in shortlists]))
+                union_vectors = await self.full_vectors(db, union)
+
+                for i, positions in shortlists:
+                    scores = union_vectors[np.searchsorted(union, positions)] @ queries[i]
+                    results[i] = self._top_k(positions, scores, limit)
+
+        return results
+
+    # ------ SHARDED SEARCH ------
+
+    async def ensure_shards(self):
+        """
+        Publish the matrix to the shard workers after a load or patch
+
+        A load publishes the matrix as loaded (a snapshot is mapped, not
+        copied); patches since go out as a delta of their rows only.
+        """
+        if self._shards_version == self._version and not self._unpublished_rows:
+            return
+
+        async with self._lock:
+            if self._shards_version != self._version:
+                await asyncio.to_thread(self.shards.publish, self._shards_base)
+                self._shards_version = self._version
+                self._shards_base = None
+
+            if self._unpublished_rows:
+                rows = np.fromiter(self._unpublished_rows, dtype=np.int64, count=len(self._unpublished_rows))
+                if not await asyncio.to_thread(self.shards.publish_rows, self.embeddings, rows):
+                    # The delta outgrew MAX_DELTA_ROWS: fold it into a new base
+                    await asyncio.to_thread(self.shards.publish, self.embeddings)
+                self._unpublished_rows = set()
+
+    def close(self):
+        """Stop the shard workers (removing their private matrix files) and any reload"""
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+        if self.shards is not None:
+            self.shards.close()
+
+    async def _search_sharded(
+        self,
+        queries: np.ndarray,
+        valid: np.ndarray,
+        limit: int,
+        filters: Optional[List[dict]],
+        results: List[List[dict]]
+    ) -> List[List[dict]]:
+        """search_batch with the scan scattered over the shard workers"""
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            block = [i for i in range(start, min(start + QUERY_BLOCK_SIZE, len(queries))) if valid[i]]
+            if not block:
+                continue
+
+            # Masks cover the published rows; rows appended since go out with the next delta
+            masks = []
+            for i in block:
+                mask = self.filter_mask(**(filters[i] if filters else {}))
+                masks.append(None if mask is None else mask[:self.shards.rows])
+
+            hits = await self.shards.search(queries[block], limit, masks)
+            for i, (positions, scores) in zip(block, hits):
+                results[i] = self._top_k(positions, scores, limit)
+
+        return results
+
+    # ------ INCREMENTAL UPDATES ------
+
+    def positions_of(self, project_ids) -> np.ndarray:
+        """Row position of each project id (-1 when not resident)"""
+        project_ids = np.asarray(project_ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(len(project_ids), -1, dtype=np.int64)
+
+        found = np.minimum(np.searchsorted(self._sorted_ids, project_ids), len(self._sorted_ids) - 1)
+        hit = self._sorted_ids[found] == project_ids
+        if self._sorted_positions is not None:
+            found = self._sorted_positions[found]
+        return np.where(hit, found, -1)
+
+    def _writable(self, name: str, array: np.ndarray, rows: int) -> np.ndarray:
+        """
+        `array` resized to `rows` rows, backed by a private buffer
+
+        Buffers grow geometrically so a stream of appends costs amortized
+        O(1) per row. The first patch of a memory-mapped snapshot copies
+        it (that worker stops sharing pages until the next snapshot).
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or len(buffer) < rows:
+            current = len(array) if buffer is None else len(buffer)
+            capacity = max(rows, current + current // 2) if rows > len(array) else rows
+            grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            buffer = self._buffers[name] = grown
+        return buffer[:rows]
+
+    async def apply_changes(self, db: AsyncSession, project_ids: List[int]) -> dict:
+        """
+        Patch changed projects into the resident index without a reload
+
+        Each id is re-read from Postgres and its row is replaced (new
+        embedding or metadata), appended (new project) or tombstoned (gone).
+        Bitmaps, quantized codes and the ANN index are patched alongside.
+        """
+        counts = {'replaced': 0, 'appended': 0, 'tombstoned': 0}
+        if self._changed_during_reload is not None:
+            # The rebuilt arrays may have been read before this change
+            self._changed_during_reload.update(project_ids)
+        if self._loaded_at is None or not project_ids:
+            return counts  # the next full load sees everything
+
+        ids, vectors, metadata = await self._load_database(db, project_ids)
+
+        async with self._lock:
+            if self._loaded_at is None:
+                return counts
+
+            positions = self.positions_of(ids)
+            existing = positions >= 0
+            gone = self.positions_of(np.setdiff1d(np.asarray(project_ids, dtype=np.int64), ids))
+            gone = gone[gone >= 0]
+            gone = gone[self.alive[gone]]
+
+            old_size = self.size
+            new_size = old_size + int((~existing).sum())
+            rows = positions.copy()
+            rows[~existing] = np.arange(old_size, new_size)
+
+            # No awaits below: searches never observe a half-applied patch
+            if self.embeddings is not None:
+                self.embeddings = self._writable('embeddings', self.embeddings, new_size)
+                self.embeddings[rows] = vectors
+            if self.codes is not None:
+                self.codes = self._writable('codes', self.codes, new_size)
+                self.codes[rows] = self.quantizer.encode(vectors)
+
+            self.ids = self._writable('ids', self.ids, new_size)
+            self.ids[rows] = ids
+            self.alive = self._writable('alive', self.alive, new_size)
+            self.alive[rows] = True
+            self.alive[gone] = False
+
+            self.metadata.extend([None] * (new_size - old_size))
+            for bitmap in self.bitmaps.values():
+                bitmap.resize(new_size)
+
+            changes = list(zip(rows.tolist(), metadata)) + [(row, None) for row in gone.tolist()]
+            for row, after in changes:
+                before = self.metadata[row]
+                for field, bitmap in self.bitmaps.items():
+                    bitmap.update(row, self._filter_values(before, field), self._filter_values(after, field))
+                self.metadata[row] = after
+
+            if new_size > old_size:
+                if np.all(np.diff(self.ids) > 0):
+                    self._sorted_ids, self._sorted_positions = self.ids, None
+                else:
+                    order = np.argsort(self.ids, kind='stable')
+                    self._sorted_ids, self._sorted_positions = self.ids[order], order
+
+            if self.ann is not None and self.ann.is_trained:
+                self.ann.delete(self.ids[gone])
+                self.ann.add(ids, vectors)
+
+            if self.shards is not None and not self.is_quantized:
+                self._unpublished_rows.update(rows.tolist())
+            counts['replaced'] = int(existing.sum())
+            counts['appended'] = new_size - old_size
+            counts['tombstoned'] = len(gone)
+            return counts
+
+    # ------ APPROXIMATE SEARCH (IVF-PQ) ------
+
+    def ann_file(self) -> Optional[str]:
+        """ann_path with the model version in the name (ann.npz -> ann_<model_version>.npz)"""
+        if not self.ann_path:
+            return None
+        root, ext = os.path.splitext(self.ann_path)
+        version = re.sub(r'[^A-Za-z0-9.-]+', '_', self.model_version or '')
+        return f"{root}_{version}{ext or '.npz'}"
+
+    async def _ann_vectors(self, db: AsyncSession) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, full-precision vectors) of the live rows, to train and sync the ANN index"""
+        live = np.flatnonzero(self.alive)
+        if self.embeddings is not None:
+            return self.ids[live], self.embeddings[live]
+
+        # Only codes are resident. Decoded codes (+-1 signs in binary mode)
+        # would train poor codebooks and never match the vectors apply_changes
+        # adds, so the ANN index reads the stored vectors instead
+        ids, vectors, _ = await self._load_database(db)
+        keep = np.isin(ids, self.ids[live])
+        return ids[keep], vectors[keep]
+
+    def sync_ann(self, live_ids: np.ndarray, vectors: np.ndarray):
+        """
+        Bring the ANN index in line with the live projects' vectors
+
+        Loads the persisted index if there is one, trains a new one if
+        not, then deletes ids that are gone and (re-)adds new projects and
+        those whose vector changed, so it matches the loaded projects.
+        """
+        started = time.perf_counter()
+
+        ann_file = self.ann_file()
+        if self.ann is None and ann_file and os.path.exists(ann_file):
+            self.ann = IVFPQIndex.load(ann_file)
+
+        if self.ann is None or not self.ann.is_trained:
+            self.ann = IVFPQIndex(dim=EMBEDDING_DIM)
+            if len(live_ids):
+                self.ann.build(live_ids, vectors)
+        else:
+            indexed = np.fromiter(self.ann.id_to_list.keys(), dtype=np.int64, count=len(self.ann))
+            self.ann.delete(np.setdiff1d(indexed, live_ids))
+            changed = self.ann.changed(live_ids, vectors)
+            self.ann.add(live_ids[changed], vectors[changed])
+
+        if ann_file and self.ann.is_trained:
+            self.ann.save(ann_file)
+
+        self._ann_synced_at = self._loaded_at
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"✅ Synced ANN index: {len(self.ann)} vectors, {self.ann.n_lists} lists in {elapsed_ms:.0f}ms")
+
+    async def ensure_ann(self, db: AsyncSession):
+        """Sync the ANN index after every catalog (re)load, off the event loop"""
+        if self._ann_synced_at == self._loaded_at:
+            return
+
+        async with self._lock:
+            if self._ann_synced_at != self._loaded_at:
+                live_ids, vectors = await self._ann_vectors(db)
+                await asyncio.to_thread(self.sync_ann, live_ids, vectors)
+
+    async def search_ann(
+        self,
+        db: AsyncSession,
+        query_embedding: List[float],
+        limit: int = 20,
+        difficulty_filter: Optional[str] = None,
+        source_filter: Optional[List[str]] = None,
+        language_filter: Optional[List[str]] = None,
+        topics_filter: Optional[List[str]] = None,
+        nprobe: int = 8,
+        candidates: int = 200
+    ) -> List[dict]:
+        """
+        IVF-PQ candidate generation + exact rerank
+
+        The ANN index proposes `candidates` ids from the `nprobe` closest
+        lists; those are re-scored with full-precision vectors.
+        """
+
+        query = self._unit_query(query_embedding)
+        if self.ann is None or self.size == 0 or limit <= 0 or query is None:
+            return []
+
+        mask = self.filter_mask(difficulty_filter, source_filter, language_filter, topics_filter)
+        allowed_ids = self.ids[mask] if mask is not None else None
+
+        candidate_ids, _ = self.ann.search(
+            query,
+            k=max(limit, candidates),
+            nprobe=nprobe,
+            allowed_ids=allowed_ids
+        )
+
+        positions = self.positions_of(candidate_ids)
+        positions = positions[positions >= 0]
+
+        return await self.rerank(db, query, positions, limit)
+
+# Shared per-process instance
+project_index = ProjectVectorIndex(
+    ttl_seconds=config.VECTOR_INDEX_TTL_SECONDS,
+    ann_path=config.ANN_INDEX_PATH,
+    quantization=config.VECTOR_QUANTIZATION,
+    rerank_candidates=config.VECTOR_RERANK_CANDIDATES,
+    snapshot_dir=config.EMBEDDING_SNAPSHOT_DIR,
+    n_shards=config.VECTOR_INDEX_SHARDS,
+    projection_dir=config.PCA_PROJECTION_DIR,
+    pca_components=config.PCA_COMPONENTS
+)
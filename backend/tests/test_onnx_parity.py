@@ -0,0 +1,47 @@
+"""
+ONNX Backend Parity
+File: tests/test_onnx_parity.py
+
+Compares the exported ONNX encoder (fp32 and int8) with the PyTorch model on
+the curated catalog. Skipped unless onnxruntime is installed and
+ONNX_MODEL_DIR points at an export (app/scripts/export_onnx_model.py).
+
+Run:
+    ONNX_MODEL_DIR=./onnx-minilm python -m pytest tests/test_onnx_parity.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+
+MODEL_DIR = os.environ.get("ONNX_MODEL_DIR")
+if not MODEL_DIR or not os.path.isdir(MODEL_DIR):
+    pytest.skip("ONNX_MODEL_DIR is not set to an exported model", allow_module_level=True)
+
+from app.scripts.export_onnx_model import curated_texts
+from app.services.inference_pool import load_model
+from app.services.onnx_encoder import OnnxEncoder, onnx_model_path
+
+MIN_COSINE = 0.99
+
+@pytest.fixture(scope="module")
+def texts():
+    return curated_texts()
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    return np.asarray(load_model().encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+@pytest.mark.parametrize("quantized", [False, True], ids=["fp32", "int8"])
+def test_onnx_matches_torch(texts, reference, quantized):
+    if not os.path.exists(onnx_model_path(MODEL_DIR, quantized)):
+        pytest.skip(f"{onnx_model_path(MODEL_DIR, quantized)} not exported")
+
+    vectors = OnnxEncoder(MODEL_DIR, quantized=quantized).encode(texts, normalize_embeddings=True)
+
+    assert vectors.shape == reference.shape
+    cosines = (reference * vectors).sum(axis=1)
+    assert cosines.min() >= MIN_COSINE, f"min cosine {cosines.min():.4f}"